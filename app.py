@@ -1,23 +1,63 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, HTMLResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.concurrency import run_in_threadpool
 import numpy as np
-import librosa
 import creapy
-import tempfile
+import tgt
+import io
 import os
-from typing import List, Dict
+import logging
+import asyncio
+import threading
+import time
+import uuid
+import json
+import struct
+import zipfile
+import sqlite3
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Literal, Optional, Union
 import base64
+from pathlib import Path
+from pydantic import BaseModel
 
-# Initialize creapy configuration
-try:
-    creapy.set_config()
-except:
-    pass
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_workers.start()
+    yield
+    job_workers.stop()
+    pool.shutdown()
+    streams.shutdown()
 
-app = FastAPI(title="Creaky Voice Detector")
 
+app = FastAPI(title="Creaky Voice Detector", lifespan=lifespan)
+logger = logging.getLogger(__name__)
+
+# responses streamed line by line, gzip would hold the lines back until enough are buffered
+UNCOMPRESSED_PATHS = ("/analyze/batch",)
+
+
+class CompressionMiddleware:
+    """Compresses the responses with gzip, except those of `UNCOMPRESSED_PATHS`."""
+
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] not in UNCOMPRESSED_PATHS:
+            await self.gzip(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -26,6 +66,347 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+ANALYSIS_SETTINGS = ("block_size", "hop_size", "creak_threshold", "gender_model",
+                     "zcr_threshold", "ste_threshold", "audio_start", "audio_end")
+# sessions kept for /reanalyze, the least recently used are dropped first
+MAX_SESSIONS = int(os.environ.get("CREAPY_MAX_SESSIONS", 32))
+SESSION_TTL = float(os.environ.get("CREAPY_SESSION_TTL", 30 * 60))
+# "compact" is a binary encoding without the audio, see `compact_response`
+RESPONSE_FORMATS = ("json", "compact")
+COMPACT_MEDIA_TYPE = "application/x-creapy-compact"
+
+
+# level of detail: the finest waveform level has bins of this many samples, its
+# envelopes take an eighth of the memory of the signal
+WAVEFORM_BIN_SIZE = 16
+# ranges with at most this many values per pixel are served without binning
+RAW_VALUES_PER_PIXEL = 4
+TILE_SERIES = ("waveform", "probability")
+WAVEFORM_OVERVIEW_WIDTH = 1000
+MAX_TILE_WIDTH = 10000
+
+
+class PeakPyramid:
+    """Min/max envelopes of a series at halving resolutions.
+
+    Level 0 holds the minimum and maximum of bins of `bin_size` values, every further
+    level merges pairs of bins of the level below. A tile of a time range is taken
+    from the coarsest level that still has a bin per pixel, so peaks are never lost
+    by decimation and the size of a tile only depends on its width.
+    """
+
+    def __init__(self, values: np.ndarray, rate: float, t0: float = 0.0,
+                 bin_size: int = 1, scale: float = 1.0):
+        self.values = values
+        self.rate = rate
+        self.t0 = t0
+        self.bin_size = bin_size
+        self.scale = scale
+        full = len(values) // bin_size * bin_size
+        body = values[:full].reshape(-1, bin_size)
+        mins, maxs = body.min(axis=1), body.max(axis=1)
+        if full < len(values):
+            mins = np.append(mins, values[full:].min())
+            maxs = np.append(maxs, values[full:].max())
+        self.levels = [(mins.astype(np.float32), maxs.astype(np.float32))]
+        while len(self.levels[-1][0]) > 1:
+            mins, maxs = self.levels[-1]
+            if len(mins) % 2:
+                mins, maxs = np.append(mins, mins[-1]), np.append(maxs, maxs[-1])
+            self.levels.append((np.minimum(mins[0::2], mins[1::2]),
+                                np.maximum(maxs[0::2], maxs[1::2])))
+
+    @property
+    def duration(self) -> float:
+        return len(self.values) / self.rate
+
+    def tile(self, start: float, end: float, width: int) -> dict:
+        """The envelope between `start` and `end` seconds with at least `width` bins if possible.
+
+        Level -1 are the values themselves, used when the range holds only a few values
+        per pixel. Its minimum and maximum are equal.
+        """
+        start = max(start - self.t0, 0.0)
+        end = self.duration if end < 0 else min(end - self.t0, self.duration)
+        span = max(end - start, 1 / self.rate)
+        level = len(self.levels) - 1
+        while level > 0 and span * self.rate / (self.bin_size << level) < width:
+            level -= 1
+        if span * self.rate <= RAW_VALUES_PER_PIXEL * width:
+            level = -1
+        bin_size = 1 if level < 0 else self.bin_size << level
+        dt = bin_size / self.rate
+        first = int(start / dt)
+        if level < 0:
+            last = min(int(np.ceil(end / dt)) + 1, len(self.values))
+            mins = maxs = self.values[first:last].astype(np.float32)
+        else:
+            last = min(int(np.ceil(end / dt)) + 1, len(self.levels[level][0]))
+            mins, maxs = (values[first:last] for values in self.levels[level])
+        return {
+            "level": level,
+            "t0": self.t0 + first * dt,
+            "dt": dt,
+            "min": mins * np.float32(self.scale),
+            "max": maxs * np.float32(self.scale)
+        }
+
+
+def check_settings(settings: dict) -> dict:
+    """Checks the values of analysis settings, raises a `ValueError` for invalid ones."""
+    checked = dict(settings)
+    for key, value in settings.items():
+        if key == "gender_model":
+            if str(value).lower().strip() not in creapy.GENDER_MODELS:
+                raise ValueError(f"gender_model must be one of {creapy.GENDER_MODELS}, not {value!r}")
+            continue
+        try:
+            checked[key] = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"The setting {key} must be a number, not {value!r}")
+        if not np.isfinite(checked[key]):
+            raise ValueError(f"The setting {key} must be finite")
+    for key in ("block_size", "hop_size"):
+        if key in checked and checked[key] <= 0:
+            raise ValueError(f"The setting {key} must be positive")
+    start, end = checked.get("audio_start", 0), checked.get("audio_end", -1)
+    if start < 0:
+        raise ValueError("audio_start must not be negative")
+    if end != -1 and end <= start:
+        raise ValueError("audio_end must be after audio_start, or -1 for the end of the file")
+    return checked
+
+
+class AnalysisSession:
+    """The decoded upload and its `creapy.Analysis`.
+
+    The analysis is kept as long as the settings that change the blocks stay the
+    same, so changing thresholds or the gender model doesn't extract the features again.
+    """
+
+    def __init__(self, signal: np.ndarray, sr: int):
+        self.signal = signal
+        self.sr = sr
+        self.settings = {}
+        self.analysis = None
+        self.y_pred = None
+        peak = np.max(np.abs(signal)) if signal.size else 0.0
+        self.waveform = PeakPyramid(signal, sr, bin_size=WAVEFORM_BIN_SIZE,
+                                    scale=1 / peak if peak > 0 else 1.0)
+        self.probability = None
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+    def evaluate(self, settings: dict) -> dict:
+        with self.lock:
+            settings = check_settings({**self.settings, **settings})
+            framing = {key: settings.get(key) for key in creapy.FRAMING_SETTINGS}
+            analysis = self.analysis
+            if analysis is None or framing != {key: self.settings.get(key)
+                                               for key in creapy.FRAMING_SETTINGS}:
+                analysis = creapy.Analysis.from_signal(self.signal, self.sr, settings=settings)
+            # the same classification as `creapy.process_array`, the features are kept for later settings
+            result = analysis.classify(settings)
+            intervals = analysis.intervals(result.y_pred, settings)
+            hop_size = analysis.config['USER']['hop_size']
+            # the session only changes once the evaluation succeeded
+            self.analysis = analysis
+            self.settings = settings
+            self.y_pred = result.y_pred
+            self.probability = PeakPyramid(result.y_pred, 1 / hop_size,
+                                           t0=float(result.time[0]) if len(result.time) else 0.0)
+        return {
+            "creak_probability": {
+                "t0": float(result.time[0]) if len(result.time) else 0.0,
+                "dt": hop_size,
+                "time": result.time,
+                "probability": result.y_pred
+            },
+            "intervals": intervals
+        }
+
+    def tile(self, series: str, start: float, end: float, width: int) -> dict:
+        pyramid = self.waveform if series == "waveform" else self.probability
+        if pyramid is None:
+            raise ValueError("The analysis wasn't evaluated yet")
+        return pyramid.tile(start, end, width)
+
+    def textgrid(self, creak_threshold: Optional[float] = None) -> str:
+        """The creak intervals of the last evaluation as TextGrid, built in memory."""
+        with self.lock:
+            if self.y_pred is None:
+                raise ValueError("The analysis wasn't evaluated yet")
+            settings = dict(self.settings)
+            if creak_threshold is not None:
+                settings["creak_threshold"] = creak_threshold
+            config = self.analysis.config
+            intervals = [tgt.core.Interval(start, end, config["PRAAT"]["interval_text"])
+                         for start, end in self.analysis.intervals(self.y_pred, settings)]
+        textgrid = tgt.core.TextGrid()
+        textgrid.add_tier(tgt.core.IntervalTier(start_time=0, end_time=len(self.signal) / self.sr,
+                                                name=config["PRAAT"]["creak_tier_name"],
+                                                objects=intervals))
+        return tgt.io.export_to_long_textgrid(textgrid)
+
+
+class AnalysisSessions:
+    def __init__(self, max_sessions: int = MAX_SESSIONS, ttl: float = SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, AnalysisSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self):
+        now = time.monotonic()
+        for analysis_id in [key for key, session in self._sessions.items()
+                            if now - session.last_used > self.ttl]:
+            del self._sessions[analysis_id]
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def add(self, session: AnalysisSession) -> str:
+        analysis_id = uuid.uuid4().hex
+        with self._lock:
+            self._sessions[analysis_id] = session
+            self._expire()
+        return analysis_id
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def get(self, analysis_id: str):
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(analysis_id)
+            if session is not None:
+                session.last_used = time.monotonic()
+                self._sessions.move_to_end(analysis_id)
+            return session
+
+
+sessions = AnalysisSessions()
+
+# analyses run in a bounded pool of worker threads, so the event loop keeps serving
+# other requests; requests beyond the workers wait in a queue of limited depth
+WORKERS = int(os.environ.get("CREAPY_WORKERS", min(4, os.cpu_count() or 1)))
+QUEUE_DEPTH = int(os.environ.get("CREAPY_QUEUE_DEPTH", 8))
+
+
+class PoolSaturated(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("All analysis workers are busy")
+        self.retry_after = retry_after
+
+
+def _init_process_worker():
+    # every worker process loads the default model once, later jobs use the cached model
+    creapy.get_model()
+
+
+class AnalysisPool:
+    def __init__(self, workers: int = WORKERS, queue_depth: int = QUEUE_DEPTH):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis")
+        # stateless jobs run in processes, so they aren't serialized by the GIL
+        self._processes = None
+        self._lock = threading.Lock()
+        self.running = 0
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        # moving average of the duration of a job, used for the retry hint
+        self.mean_duration = 1.0
+
+    def retry_after(self) -> int:
+        waiting = self.running + self.queued
+        return max(1, int(np.ceil(self.mean_duration * waiting / self.workers)))
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(max_workers=self.workers,
+                                                      initializer=_init_process_worker)
+            return self._processes
+
+    def has_capacity(self) -> bool:
+        with self._lock:
+            return self.running + self.queued < self.workers + self.queue_depth
+
+    def submit(self, func, *args, isolated: bool = False, timed: bool = True) -> Future:
+        """Submits `func(*args)` to a worker, raises `PoolSaturated` if the queue is full.
+
+        With `isolated` the job runs in a worker process, `func` and its arguments must
+        be picklable and the job can't use the state of the server process. Jobs that
+        aren't `timed` (e.g. long recordings) don't count for the mean duration.
+        """
+        with self._lock:
+            if self.running + self.queued >= self.workers + self.queue_depth:
+                self.rejected += 1
+                raise PoolSaturated(self.retry_after())
+            self.queued += 1
+
+        def job():
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+            t = time.perf_counter()
+            failed = True
+            try:
+                if isolated:
+                    result = self._process_pool().submit(func, *args).result()
+                else:
+                    result = func(*args)
+                failed = False
+                return result
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    if failed:
+                        self.failed += 1
+                    else:
+                        self.completed += 1
+                    if timed:
+                        self.mean_duration = 0.8 * self.mean_duration + 0.2 * (time.perf_counter() - t)
+
+        return self._executor.submit(job)
+
+    async def run(self, func, *args, isolated: bool = False):
+        """Runs `func(*args)` on a worker, see `submit`."""
+        return await asyncio.wrap_future(self.submit(func, *args, isolated=isolated))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_depth": self.queue_depth,
+                "running": self.running,
+                "queued": self.queued,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "mean_duration": self.mean_duration,
+            }
+
+
+pool = AnalysisPool()
+
+
+async def run_in_pool(func, *args):
+    try:
+        return await pool.run(func, *args)
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(e.retry_after)})
+
+
 @app.post("/analyze")
 async def analyze_audio(
     file: UploadFile = File(...),
@@ -36,98 +417,934 @@ async def analyze_audio(
     zcr_threshold: float = Form(0.08),
     ste_threshold: float = Form(0.00001),
     audio_start: float = Form(0),
-    audio_end: float = Form(-1)
+    audio_end: float = Form(-1),
+    response_format: str = Form('json')
 ):
     if not file.filename.lower().endswith('.wav'):
         raise HTTPException(status_code=400, detail="Only WAV files are supported")
+    if response_format not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown response format, choose one of {RESPONSE_FORMATS}")
     
+    content = await file.read()
+    # Settings only apply to this request, the creapy config file is left untouched
+    settings = dict(
+        block_size=block_size,
+        hop_size=hop_size,
+        creak_threshold=creak_threshold,
+        zcr_threshold=zcr_threshold,
+        ste_threshold=ste_threshold,
+        audio_start=audio_start,
+        audio_end=audio_end,
+        gender_model=gender_model
+    )
+    result = await run_in_pool(_analyze, content, settings)
+    if response_format == "compact":
+        return compact_response(result)
+    return json_response(result, content)
+
+
+def _analyze(content: bytes, settings: dict) -> dict:
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp_audio:
-            content = await file.read()
-            tmp_audio.write(content)
-            tmp_audio_path = tmp_audio.name
-        
-        audio_data, sr = librosa.load(tmp_audio_path, sr=None)
-        
-        duration = len(audio_data) / sr
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.TextGrid') as tmp_textgrid:
-            tmp_textgrid_path = tmp_textgrid.name
-            with open(tmp_textgrid_path, 'w') as f:
-                f.write('File type = "ooTextFile"\n')
-                f.write('Object class = "TextGrid"\n\n')
-                f.write(f'xmin = 0\n')
-                f.write(f'xmax = {duration}\n')
-                f.write('tiers? <exists>\n')
-                f.write('size = 1\n')
-                f.write('item []:\n')
-                f.write('    item [1]:\n')
-                f.write('        class = "IntervalTier"\n')
-                f.write('        name = "default"\n')
-                f.write(f'        xmin = 0\n')
-                f.write(f'        xmax = {duration}\n')
-                f.write('        intervals: size = 1\n')
-                f.write('        intervals [1]:\n')
-                f.write('            xmin = 0\n')
-                f.write(f'            xmax = {duration}\n')
-                f.write('            text = ""\n')
-        
-        # Apply custom settings to creapy
-        creapy.set_config(
-            block_size=block_size,
-            hop_size=hop_size,
-            creak_threshold=creak_threshold,
-            zcr_threshold=zcr_threshold,
-            ste_threshold=ste_threshold,
-            audio_start=audio_start,
-            audio_end=audio_end,
-            gender_model=gender_model
-        )
-        
-        X_test, y_pred, sr_creapy = creapy.process_file(
-            audio_path=tmp_audio_path,
-            textgrid_path=tmp_textgrid_path,
-            gender_model=gender_model
-        )
-        
-        time_vector = np.arange(len(y_pred)) * hop_size
-        
-        audio_data_normalized = audio_data / np.max(np.abs(audio_data))
-        
-        duration = len(audio_data) / sr
-        waveform_samples = min(1000, len(audio_data))
-        step = len(audio_data) // waveform_samples
-        waveform_data = audio_data_normalized[::step].tolist()
-        waveform_time = np.arange(0, len(audio_data), step) / sr
-        
-        result = {
-            "duration": duration,
-            "sample_rate": int(sr),
-            "creak_probability": {
-                "time": time_vector.tolist(),
-                "probability": y_pred.tolist()
-            },
-            "waveform": {
-                "time": waveform_time.tolist(),
-                "amplitude": waveform_data
-            },
-            "audio_base64": base64.b64encode(content).decode('utf-8')
-        }
-        
-        os.unlink(tmp_audio_path)
-        os.unlink(tmp_textgrid_path)
-        
-        return JSONResponse(content=result)
-        
+        # the upload is decoded once, in memory; the waveform and the analysis share the signal
+        signal, sr = creapy.read_wav(io.BytesIO(content), normalize=False)
+        session = AnalysisSession(signal, sr)
+        result = session.evaluate(settings)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        import traceback
-        error_detail = f"Error: {str(e)}\n\nTraceback:\n{traceback.format_exc()}"
-        print(error_detail)
-        
-        if 'tmp_audio_path' in locals() and os.path.exists(tmp_audio_path):
-            os.unlink(tmp_audio_path)
-        if 'tmp_textgrid_path' in locals() and os.path.exists(tmp_textgrid_path):
-            os.unlink(tmp_textgrid_path)
+        logger.exception("Analysis of an upload failed")
         raise HTTPException(status_code=500, detail=str(e))
+    # only successfully evaluated uploads are kept for /reanalyze
+    analysis_id = sessions.add(session)
+
+    # an overview of the waveform, the client fetches finer tiles when zooming in
+    waveform = session.tile("waveform", 0, -1, WAVEFORM_OVERVIEW_WIDTH)
+
+    result.update({
+        "analysis_id": analysis_id,
+        "duration": len(signal) / sr,
+        "sample_rate": int(sr),
+        "waveform": waveform
+    })
+    return result
+
+
+def _zero_runs(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Run-length encodes the zeros of the probabilities of gated blocks.
+
+    Returns the lengths of alternating runs of zeros and non-zero values, starting
+    with a (possibly empty) run of zeros, and the non-zero values.
+    """
+    nonzero = values != 0
+    edges = np.flatnonzero(np.diff(nonzero.view(np.int8))) + 1
+    runs = np.diff(np.concatenate(([0], edges, [values.size])))
+    if values.size and nonzero[0]:
+        runs = np.concatenate(([0], runs))
+    return runs.astype("<u4"), values[nonzero].astype("<f4")
+
+
+def compact_response(result: dict) -> Response:
+    """Encodes a result in the compact binary format.
+
+    The body is a little-endian uint32 with the length of a JSON header, the header
+    and the arrays the header refers to by byte offset, length and dtype. The time
+    axes are given by `t0` and `dt` only, the audio isn't sent back.
+    """
+    arrays = {}
+    header = {key: value for key, value in result.items()
+              if key not in ("creak_probability", "waveform", "intervals", "audio_base64")}
+    header["intervals"] = np.asarray(result["intervals"]).tolist()
+    probability = result["creak_probability"]
+    runs, values = _zero_runs(np.asarray(probability["probability"]))
+    header["creak_probability"] = {"t0": probability["t0"], "dt": probability["dt"],
+                                   "length": len(probability["probability"]),
+                                   "runs": "probability_runs", "values": "probability_values"}
+    arrays["probability_runs"], arrays["probability_values"] = runs, values
+    if "waveform" in result:
+        waveform = result["waveform"]
+        header["waveform"] = {"level": waveform["level"], "t0": waveform["t0"], "dt": waveform["dt"],
+                              "min": "waveform_min", "max": "waveform_max"}
+        arrays["waveform_min"] = np.asarray(waveform["min"], dtype="<f4")
+        arrays["waveform_max"] = np.asarray(waveform["max"], dtype="<f4")
+
+    header["arrays"], offset = {}, 0
+    for name, array in arrays.items():
+        header["arrays"][name] = {"dtype": array.dtype.str, "offset": offset, "length": array.size}
+        offset += array.nbytes
+    encoded = json.dumps(header).encode()
+    # the arrays start at a multiple of 4 bytes, so the client can view them without copies
+    encoded += b" " * (-len(encoded) % 4)
+    body = b"".join([struct.pack("<I", len(encoded)), encoded]
+                    + [array.tobytes() for array in arrays.values()])
+    return Response(content=body, media_type=COMPACT_MEDIA_TYPE)
+
+
+def json_response(result: dict, content: Optional[bytes] = None) -> JSONResponse:
+    """Encodes a result as JSON, with the uploaded audio if given."""
+    def _convert(value):
+        if isinstance(value, dict):
+            return {key: _convert(item) for key, item in value.items()}
+        if isinstance(value, np.ndarray):
+            return value.tolist()
+        return value
+
+    result = _convert(result)
+    if content is not None:
+        result["audio_base64"] = base64.b64encode(content).decode('utf-8')
+    return JSONResponse(content=result)
+
+
+def _analyze_batch_file(name: str, content: bytes, settings: dict,
+                        include_probabilities: bool) -> dict:
+    """Classifies a file of a batch in a worker process, errors are returned instead of raised."""
+    t = time.perf_counter()
+    record = {"file": name, "error": None}
+    try:
+        signal, sr = creapy.read_wav(io.BytesIO(content), normalize=False)
+        decoded = time.perf_counter()
+        config = creapy.apply_settings(settings)
+        result = creapy.process_array(signal, sr, config=config)
+        intervals = creapy.get_creak_interval_array(result.y_pred, result.time, config=config)
+        record.update({
+            "duration": len(signal) / sr,
+            "sample_rate": int(sr),
+            "intervals": intervals.tolist()
+        })
+        if include_probabilities:
+            record["creak_probability"] = {
+                "t0": float(result.time[0]) if len(result.time) else 0.0,
+                "dt": config['USER']['hop_size'],
+                "probability": result.y_pred.tolist()
+            }
+        record["timing"] = {"decode": decoded - t, "analysis": time.perf_counter() - decoded}
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record.setdefault("timing", {})["total"] = time.perf_counter() - t
+    return record
+
+
+def _batch_items(name: str, content: bytes) -> list:
+    """The files of an upload of a batch as (name, loader or None, error) tuples."""
+    if name.lower().endswith('.wav'):
+        return [(name, lambda: content, None)]
+    if not name.lower().endswith('.zip'):
+        return [(name, None, "Only WAV files and zip archives are supported")]
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(content))
+    except zipfile.BadZipFile:
+        return [(name, None, "Invalid zip archive")]
+    # the members are decompressed only when a worker is free for them
+    return [(f"{name}/{info.filename}", lambda info=info: archive.read(info), None)
+            for info in archive.infolist()
+            if not info.is_dir() and info.filename.lower().endswith('.wav')]
+
+
+async def _batch_results(items: list, settings: dict, include_probabilities: bool):
+    """Yields a NDJSON record per file as soon as it is classified, and a summary at the end."""
+    t = time.perf_counter()
+    # a batch keeps at most one file per worker in flight, so single uploads are still served
+    slots = asyncio.Semaphore(pool.workers)
+
+    async def classify(index: int, name: str, load, error: Optional[str]) -> dict:
+        if error is not None:
+            return {"index": index, "file": name, "error": error}
+        async with slots:
+            while True:
+                try:
+                    record = await pool.run(_analyze_batch_file, name, load(), settings,
+                                            include_probabilities, isolated=True)
+                    break
+                except PoolSaturated as e:
+                    await asyncio.sleep(min(e.retry_after, 1))
+                except Exception as e:
+                    record = {"file": name, "error": f"{type(e).__name__}: {e}"}
+                    break
+        return {"index": index, **record}
+
+    tasks = [asyncio.create_task(classify(index, *item)) for index, item in enumerate(items)]
+    errors, audio_seconds, cpu_seconds = 0, 0.0, 0.0
+    try:
+        for task in asyncio.as_completed(tasks):
+            record = await task
+            errors += record["error"] is not None
+            audio_seconds += record.get("duration", 0.0)
+            cpu_seconds += record.get("timing", {}).get("total", 0.0)
+            yield json.dumps(record) + "\n"
+    finally:
+        # the client went away, files that didn't start yet are dropped
+        for task in tasks:
+            task.cancel()
+    yield json.dumps({"summary": {
+        "files": len(items),
+        "errors": errors,
+        "audio_seconds": audio_seconds,
+        "processing_seconds": cpu_seconds,
+        "wall_seconds": time.perf_counter() - t
+    }}) + "\n"
+
+
+@app.post("/analyze/batch")
+async def analyze_batch(
+    files: List[UploadFile] = File(...),
+    block_size: float = Form(0.04),
+    hop_size: float = Form(0.01),
+    creak_threshold: float = Form(0.75),
+    gender_model: str = Form('all'),
+    zcr_threshold: float = Form(0.08),
+    ste_threshold: float = Form(0.00001),
+    audio_start: float = Form(0),
+    audio_end: float = Form(-1),
+    include_probabilities: bool = Form(True)
+):
+    """Classifies WAV files and the WAV files of zip archives on the worker pool.
+
+    The result of every file is streamed as a line of NDJSON when it is done, in the
+    order of completion with its `index`; errors are part of the record of a file.
+    """
+    settings = dict(
+        block_size=block_size,
+        hop_size=hop_size,
+        creak_threshold=creak_threshold,
+        zcr_threshold=zcr_threshold,
+        ste_threshold=ste_threshold,
+        audio_start=audio_start,
+        audio_end=audio_end,
+        gender_model=gender_model
+    )
+    items = []
+    for file in files:
+        items.extend(_batch_items(file.filename, await file.read()))
+    if not items:
+        raise HTTPException(status_code=400, detail="The upload contains no WAV files")
+    return StreamingResponse(_batch_results(items, settings, include_probabilities),
+                             media_type="application/x-ndjson")
+
+
+class ReanalyzeRequest(BaseModel):
+    analysis_id: str
+    settings: Dict[str, Union[float, str]] = {}
+    response_format: Literal[RESPONSE_FORMATS] = "json"
+
+
+@app.post("/reanalyze")
+async def reanalyze_audio(request: ReanalyzeRequest):
+    """Classifies an uploaded file again with new settings, using the state kept from `/analyze`."""
+    session = sessions.get(request.analysis_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired analysis, upload the file again")
+    unknown = set(request.settings) - set(ANALYSIS_SETTINGS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown settings: {sorted(unknown)}")
+    try:
+        result = await run_in_pool(session.evaluate, request.settings)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result["analysis_id"] = request.analysis_id
+    if request.response_format == "compact":
+        return compact_response(result)
+    return json_response(result)
+
+
+@app.get("/tiles/{analysis_id}")
+async def get_tile(analysis_id: str, series: str = "waveform", start: float = 0.0,
+                   end: float = -1, width: int = 1000):
+    """The min/max envelope of the waveform or the creak probability for a time range.
+
+    The resolution is chosen from precomputed levels so that there is at least one bin
+    per pixel of `width`, `end` = -1 is the end of the file.
+    """
+    session = sessions.get(analysis_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired analysis, upload the file again")
+    if series not in TILE_SERIES:
+        raise HTTPException(status_code=400, detail=f"Unknown series, choose one of {TILE_SERIES}")
+    if not 0 < width <= MAX_TILE_WIDTH:
+        raise HTTPException(status_code=400, detail=f"The width must be between 1 and {MAX_TILE_WIDTH}")
+    try:
+        tile = session.tile(series, start, end, width)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return json_response({"series": series, **tile})
+
+
+@app.get("/textgrid/{analysis_id}")
+async def download_textgrid(analysis_id: str, creak_threshold: Optional[float] = None):
+    """The creak intervals of the last (re)analysis of an upload as TextGrid file.
+
+    The creak threshold can be changed without analysing the file again.
+    """
+    session = sessions.get(analysis_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired analysis, upload the file again")
+    try:
+        content = session.textgrid(creak_threshold)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return Response(content=content, media_type="text/plain; charset=utf-8",
+                    headers={"Content-Disposition": f'attachment; filename="creapy_{analysis_id}.TextGrid"'})
+
+
+# jobs for long recordings are kept in a SQLite database with their audio and results
+# next to it, so they survive restarts of the server
+JOBS_DIR = Path(os.environ.get("CREAPY_JOBS_DIR", "jobs"))
+JOB_WORKERS = int(os.environ.get("CREAPY_JOB_WORKERS", 1))
+JOB_TTL = float(os.environ.get("CREAPY_JOB_TTL", 24 * 60 * 60))
+# a running job whose worker didn't report progress for this long is resumed by another worker
+JOB_LEASE = float(os.environ.get("CREAPY_JOB_LEASE", 120))
+JOB_MAX_ATTEMPTS = 3
+# number of blocks classified between two progress reports
+JOB_PROGRESS_BLOCKS = 1000
+JOB_POLL_INTERVAL = 1.0
+FINISHED_JOB_STATUSES = ("done", "failed", "cancelled")
+
+
+class JobInterrupted(Exception):
+    """The job was cancelled or its worker is stopping."""
+
+
+class JobStore:
+    """Analysis jobs in a SQLite database, their audio and results are files next to it.
+
+    A worker claims the oldest queued job, or a running job whose worker stopped
+    reporting progress for `lease` seconds, e.g. because the server was restarted.
+    Finished jobs are removed `ttl` seconds after they finished.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            filename TEXT,
+            settings TEXT NOT NULL,
+            status TEXT NOT NULL,
+            created REAL NOT NULL,
+            started REAL,
+            finished REAL,
+            heartbeat REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            frames_done INTEGER NOT NULL DEFAULT 0,
+            frames_total INTEGER,
+            result TEXT,
+            error TEXT
+        )"""
+
+    def __init__(self, directory: Path, ttl: float = JOB_TTL, lease: float = JOB_LEASE):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.lease = lease
+        self._db = sqlite3.connect(self.directory / "jobs.sqlite3", timeout=30,
+                                   check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(self.SCHEMA)
+        self._lock = threading.Lock()
+
+    def audio_path(self, job_id: str) -> Path:
+        return self.directory / f"{job_id}.wav"
+
+    def result_path(self, job_id: str) -> Path:
+        return self.directory / f"{job_id}.npz"
+
+    def _execute(self, sql: str, *args) -> int:
+        """Runs a statement and returns the number of changed rows."""
+        with self._lock:
+            return self._db.execute(sql, args).rowcount
+
+    def _fetchone(self, sql: str, *args) -> Optional[sqlite3.Row]:
+        with self._lock:
+            return self._db.execute(sql, args).fetchone()
+
+    def _fetchall(self, sql: str, *args) -> list:
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    def submit(self, content: bytes, filename: str, settings: dict) -> str:
+        job_id = uuid.uuid4().hex
+        tmp_path = self.audio_path(job_id).with_suffix(".tmp")
+        tmp_path.write_bytes(content)
+        os.replace(tmp_path, self.audio_path(job_id))
+        self._execute("INSERT INTO jobs (id, filename, settings, status, created) VALUES (?, ?, ?, 'queued', ?)",
+                      job_id, filename, json.dumps(settings), time.time())
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._fetchone("SELECT * FROM jobs WHERE id = ?", job_id)
+        return None if row is None else dict(row)
+
+    def claim(self) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # jobs that stopped their workers too often aren't tried again
+                self._db.execute(
+                    "UPDATE jobs SET status = 'failed', finished = ?, error = ? "
+                    "WHERE status = 'running' AND heartbeat < ? AND attempts >= ?",
+                    (now, f"The worker stopped {JOB_MAX_ATTEMPTS} times while running the job",
+                     now - self.lease, JOB_MAX_ATTEMPTS))
+                row = self._db.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' OR (status = 'running' AND heartbeat < ?) "
+                    "ORDER BY created LIMIT 1", (now - self.lease,)).fetchone()
+                if row is not None:
+                    # the features aren't kept, a resumed job starts from the beginning
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'running', started = ?, heartbeat = ?, frames_done = 0, "
+                        "attempts = attempts + 1 WHERE id = ?", (now, now, row["id"]))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return None if row is None else self.get(row["id"])
+
+    def progress(self, job_id: str, frames_done: int, frames_total: int) -> str:
+        """Records the progress of a running job and returns its status."""
+        self._execute("UPDATE jobs SET frames_done = ?, frames_total = ?, heartbeat = ? "
+                      "WHERE id = ? AND status = 'running'", frames_done, frames_total, time.time(), job_id)
+        row = self._fetchone("SELECT status FROM jobs WHERE id = ?", job_id)
+        return "cancelled" if row is None else row["status"]
+
+    def finish(self, job_id: str, result: dict, arrays: dict):
+        tmp_path = self.directory / f"{job_id}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, self.result_path(job_id))
+        self._execute("UPDATE jobs SET status = 'done', finished = ?, frames_done = frames_total, result = ? "
+                      "WHERE id = ? AND status = 'running'", time.time(), json.dumps(result), job_id)
+        self.audio_path(job_id).unlink(missing_ok=True)
+
+    def fail(self, job_id: str, error: str):
+        self._execute("UPDATE jobs SET status = 'failed', finished = ?, error = ? WHERE id = ? AND status = 'running'",
+                      time.time(), error, job_id)
+        self.audio_path(job_id).unlink(missing_ok=True)
+
+    def requeue(self, job_id: str):
+        """Returns a job of a stopping worker to the queue, without counting the attempt."""
+        self._execute("UPDATE jobs SET status = 'queued', attempts = attempts - 1 WHERE id = ? AND status = 'running'",
+                      job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancels a queued or running job.
+
+        A running job stops at its next progress report, its worker removes the audio.
+        """
+        now = time.time()
+        with self._lock:
+            queued = self._db.execute("UPDATE jobs SET status = 'cancelled', finished = ? "
+                                      "WHERE id = ? AND status = 'queued'", (now, job_id)).rowcount
+            running = self._db.execute("UPDATE jobs SET status = 'cancelled', finished = ? "
+                                       "WHERE id = ? AND status = 'running'", (now, job_id)).rowcount
+        if queued:
+            self.discard_audio(job_id)
+        return queued + running > 0
+
+    def discard_audio(self, job_id: str):
+        self.audio_path(job_id).unlink(missing_ok=True)
+
+    def delete(self, job_id: str):
+        self._execute("DELETE FROM jobs WHERE id = ?", job_id)
+        self.audio_path(job_id).unlink(missing_ok=True)
+        self.result_path(job_id).unlink(missing_ok=True)
+
+    def expire(self):
+        placeholders = ", ".join("?" * len(FINISHED_JOB_STATUSES))
+        rows = self._fetchall(f"SELECT id FROM jobs WHERE status IN ({placeholders}) AND finished < ?",
+                              *FINISHED_JOB_STATUSES, time.time() - self.ttl)
+        for row in rows:
+            self.delete(row["id"])
+
+    def counts(self) -> dict:
+        rows = self._fetchall("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+        return {row["status"]: row["n"] for row in rows}
+
+
+class JobWorkers:
+    """Threads that claim the jobs of a `JobStore` and run them on the analysis pool.
+
+    A job occupies a worker of the pool while it runs, so jobs and requests share the
+    concurrency bound of the pool; a job is only claimed when the pool has capacity.
+    Progress (`frames_done`) is reported for the status of a job, a job that is
+    resumed after its worker stopped is analysed again from the beginning.
+    """
+
+    def __init__(self, store_factory, pool: AnalysisPool, workers: int = JOB_WORKERS):
+        self._store_factory = store_factory
+        self.pool = pool
+        self.workers = workers
+        self._stop = threading.Event()
+        self._threads = []
+
+    @property
+    def store(self) -> JobStore:
+        return self._store_factory()
+
+    def start(self):
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._loop, name=f"job-worker-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.store.expire()
+            job = self.store.claim() if self.pool.has_capacity() else None
+            if job is None:
+                self._stop.wait(JOB_POLL_INTERVAL)
+                continue
+            try:
+                self.pool.submit(self.run, job, timed=False).result()
+            except PoolSaturated:
+                # the requests took the capacity meanwhile
+                self.store.requeue(job["id"])
+                self._stop.wait(JOB_POLL_INTERVAL)
+
+    def _report(self, job_id: str, frames_done: int, frames_total: int):
+        if self.store.progress(job_id, frames_done, frames_total) != "running":
+            raise JobInterrupted("The job was cancelled")
+        if self._stop.is_set():
+            raise JobInterrupted("The worker is stopping")
+
+    def run(self, job: dict):
+        job_id = job["id"]
+        try:
+            settings = json.loads(job["settings"])
+            config = creapy.apply_settings(settings)
+            start, end = config['USER']['audio_start'], config['USER']['audio_end']
+            data, sr = creapy.read_wav(str(self.store.audio_path(job_id)), start=start, end=end,
+                                       dtype=creapy.get_signal_dtype(config).name,
+                                       normalization=config['USER'].get('normalization', 'global'))
+            analysis = creapy.Analysis(data, sr, config=config, start_time=start)
+            included = np.flatnonzero(creapy.get_included_indices(
+                analysis.gating_values.copy(), analysis.gating_features, config))
+            # blocks excluded by the gating count as done, the features of the included
+            # blocks are calculated in steps, which are kept by the analysis
+            frames_done = analysis.num_blocks - included.size
+            self._report(job_id, frames_done, analysis.num_blocks)
+            if config["FEATURE_EXTRACTION"].get("mode", "blockwise") == "blockwise":
+                for i in range(0, included.size, JOB_PROGRESS_BLOCKS):
+                    step = included[i:i + JOB_PROGRESS_BLOCKS]
+                    analysis.classification_features(step)
+                    frames_done += step.size
+                    self._report(job_id, frames_done, analysis.num_blocks)
+            result = analysis.classify()
+            intervals = analysis.intervals(result.y_pred)
+            self.store.finish(job_id, {
+                "duration": len(data) / sr,
+                "sample_rate": int(sr),
+                "t0": float(result.time[0]) if len(result.time) else 0.0,
+                "dt": config['USER']['hop_size']
+            }, {"probability": result.y_pred, "intervals": intervals})
+        except JobInterrupted:
+            if self._stop.is_set():
+                self.store.requeue(job_id)
+            else:
+                self.store.discard_audio(job_id)
+        except Exception as e:
+            logger.exception("Job %s failed", job_id)
+            self.store.fail(job_id, f"{type(e).__name__}: {e}")
+
+
+_job_store = None
+_job_store_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    global _job_store
+    with _job_store_lock:
+        if _job_store is None:
+            _job_store = JobStore(JOBS_DIR)
+        return _job_store
+
+
+job_workers = JobWorkers(get_job_store, pool)
+
+
+def _job_status(job: dict) -> dict:
+    total = job["frames_total"]
+    expires = job["finished"] + JOB_TTL if job["status"] in FINISHED_JOB_STATUSES else None
+    return {
+        "job_id": job["id"],
+        "filename": job["filename"],
+        "status": job["status"],
+        "progress": {
+            "frames_done": job["frames_done"],
+            "frames_total": total,
+            "fraction": job["frames_done"] / total if total else 0.0
+        },
+        "attempts": job["attempts"],
+        "error": job["error"],
+        "created": job["created"],
+        "started": job["started"],
+        "finished": job["finished"],
+        "expires": expires
+    }
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    file: UploadFile = File(...),
+    block_size: float = Form(0.04),
+    hop_size: float = Form(0.01),
+    creak_threshold: float = Form(0.75),
+    gender_model: str = Form('all'),
+    zcr_threshold: float = Form(0.08),
+    ste_threshold: float = Form(0.00001),
+    audio_start: float = Form(0),
+    audio_end: float = Form(-1)
+):
+    """Queues the analysis of a (long) recording, see `/jobs/{job_id}` for its progress."""
+    if not file.filename.lower().endswith('.wav'):
+        raise HTTPException(status_code=400, detail="Only WAV files are supported")
+    settings = dict(
+        block_size=block_size,
+        hop_size=hop_size,
+        creak_threshold=creak_threshold,
+        zcr_threshold=zcr_threshold,
+        ste_threshold=ste_threshold,
+        audio_start=audio_start,
+        audio_end=audio_end,
+        gender_model=gender_model
+    )
+    try:
+        settings = check_settings(settings)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    store = get_job_store()
+    job_id = await run_in_threadpool(store.submit, await file.read(), file.filename, settings)
+    return JSONResponse(status_code=202, content=_job_status(store.get(job_id)),
+                        headers={"Location": f"/jobs/{job_id}"})
+
+
+def _get_job(job_id: str) -> dict:
+    job = get_job_store().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return job
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Status and progress of a job in blocks (frames) of the recording."""
+    return _job_status(_get_job(job_id))
+
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str, response_format: str = "json"):
+    """The creak probability and intervals of a finished job, kept for `CREAPY_JOB_TTL` seconds."""
+    if response_format not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown response format, choose one of {RESPONSE_FORMATS}")
+    job = _get_job(job_id)
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"The job is {job['status']}")
+    meta = json.loads(job["result"])
+    with np.load(get_job_store().result_path(job_id)) as arrays:
+        probability, intervals = arrays["probability"], arrays["intervals"]
+    result = {
+        "job_id": job_id,
+        "duration": meta["duration"],
+        "sample_rate": meta["sample_rate"],
+        "creak_probability": {"t0": meta["t0"], "dt": meta["dt"], "probability": probability},
+        "intervals": intervals
+    }
+    if response_format == "compact":
+        return compact_response(result)
+    return json_response(result)
+
+
+@app.delete("/jobs/{job_id}")
+async def delete_job(job_id: str):
+    """Cancels a queued or running job, or removes a finished one with its result."""
+    job = _get_job(job_id)
+    store = get_job_store()
+    if job["status"] in FINISHED_JOB_STATUSES:
+        store.delete(job_id)
+    else:
+        store.cancel(job_id)
+    return _job_status(store.get(job_id) or {**job, "status": "deleted"})
+
+
+# live streams are classified while the audio arrives. The feature extraction holds
+# the GIL, so the streams are spread over worker processes that keep their state; a
+# stream uses about half a CPU core (0.43 s per second of audio with the default settings)
+STREAM_WORKERS = int(os.environ.get("CREAPY_STREAM_WORKERS", os.cpu_count() or 1))
+MAX_STREAMS = int(os.environ.get("CREAPY_MAX_STREAMS", 2 * STREAM_WORKERS))
+# a chunk is classified at once, its length bounds the latency of a stream
+STREAM_MAX_CHUNK_SECONDS = 1.0
+STREAM_FORMATS = {"f32le": "<f4", "s16le": "<i2"}
+STREAM_SETTINGS = ("block_size", "hop_size", "creak_threshold", "gender_model",
+                   "zcr_threshold", "ste_threshold")
+# latencies kept for the percentiles in /metrics
+STREAM_LATENCY_WINDOW = 10000
+
+# the analyses of the streams of a worker process
+_stream_analyses = {}
+
+
+def _stream_open(stream_id: str, sr: int, settings: dict, peak: Optional[float]) -> dict:
+    analysis = creapy.StreamAnalysis(sr, settings, peak=peak)
+    _stream_analyses[stream_id] = analysis
+    return {"block_size": analysis.config["USER"]["block_size"],
+            "hop_size": analysis.config["USER"]["hop_size"]}
+
+
+def _stream_push(stream_id: str, samples: np.ndarray) -> creapy.StreamUpdate:
+    return _stream_analyses[stream_id].push(samples)
+
+
+def _stream_flush(stream_id: str) -> creapy.StreamUpdate:
+    return _stream_analyses.pop(stream_id).flush()
+
+
+def _stream_close(stream_id: str):
+    _stream_analyses.pop(stream_id, None)
+
+
+def _latency_summary(latencies) -> dict:
+    if len(latencies) == 0:
+        return {"count": 0, "p50_ms": None, "p95_ms": None, "max_ms": None}
+    values = np.asarray(latencies) * 1000
+    return {
+        "count": int(values.size),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "max_ms": float(values.max())
+    }
+
+
+class StreamRegistry:
+    """Admission of live streams, their worker processes and their latency.
+
+    Every worker is a process of its own, started when a stream is first assigned to
+    it. A stream stays on the worker with the fewest streams when it was opened,
+    which keeps its analysis.
+    """
+
+    def __init__(self, workers: int = STREAM_WORKERS, max_streams: int = MAX_STREAMS):
+        self.workers = workers
+        self.max_streams = max_streams
+        self._executors = [None] * workers
+        self._load = [0] * workers
+        self._lock = threading.Lock()
+        self.active = 0
+        self.total = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=STREAM_LATENCY_WINDOW)
+
+    def open(self) -> Optional[int]:
+        """Reserves a worker for a new stream, None if there are too many streams."""
+        with self._lock:
+            if self.active >= self.max_streams:
+                self.rejected += 1
+                return None
+            self.active += 1
+            self.total += 1
+            worker = int(np.argmin(self._load))
+            self._load[worker] += 1
+            if self._executors[worker] is None:
+                self._executors[worker] = ProcessPoolExecutor(max_workers=1, initializer=_init_process_worker)
+            return worker
+
+    def close(self, worker: int):
+        with self._lock:
+            self.active -= 1
+            self._load[worker] -= 1
+
+    async def run(self, worker: int, func, *args):
+        executor = self._executors[worker]
+        if executor is None:
+            raise BrokenProcessPool("The worker of the stream stopped")
+        try:
+            return await asyncio.wrap_future(executor.submit(func, *args))
+        except BrokenProcessPool:
+            # the analyses of the streams died with the process, the next stream starts a new one
+            with self._lock:
+                if self._executors[worker] is executor:
+                    self._executors[worker] = None
+            executor.shutdown(wait=False)
+            raise
+
+    async def release(self, worker: int, stream_id: str):
+        """Drops the analysis of a stream and frees its slot, also if the worker stopped."""
+        try:
+            if self._executors[worker] is not None:
+                await self.run(worker, _stream_close, stream_id)
+        except Exception:
+            logger.exception("Closing stream %s failed", stream_id)
+        finally:
+            self.close(worker)
+
+    def record(self, latency: float):
+        with self._lock:
+            self.latencies.append(latency)
+
+    def shutdown(self):
+        for executor in self._executors:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            latencies = list(self.latencies)
+            counts = {"workers": self.workers, "started": sum(e is not None for e in self._executors),
+                      "active": self.active, "total": self.total,
+                      "rejected": self.rejected, "max_streams": self.max_streams}
+        return {**counts, "latency": _latency_summary(latencies)}
+
+
+streams = StreamRegistry()
+
+
+def _stream_update(update: creapy.StreamUpdate, chunk: int, latency: float) -> dict:
+    return {
+        "type": "update",
+        "chunk": chunk,
+        "first_block": update.first_block,
+        "t0": float(update.time[0]) if len(update.time) else None,
+        "probability": update.y_pred.tolist(),
+        "intervals": update.intervals.tolist(),
+        "latency_ms": latency * 1000
+    }
+
+
+@app.websocket("/stream")
+async def stream_audio(websocket: WebSocket):
+    """Classifies audio while it is recorded or played.
+
+    The client sends a JSON start message with `sample_rate`, the sample `format`
+    (`f32le` or `s16le`), optionally `channels`, `peak` and `settings`, then the
+    interleaved samples as binary messages and `{"type": "end"}` when it is done.
+    Every binary message is answered with the creak probability of the blocks it
+    completed and the creak intervals that can't change anymore.
+    """
+    await websocket.accept()
+    worker = streams.open()
+    if worker is None:
+        await websocket.close(code=1013, reason="Too many streams, try again later")
+        return
+    stream_id = uuid.uuid4().hex
+    latencies = []
+    try:
+        start = await websocket.receive_json()
+        sr = int(start["sample_rate"])
+        channels = int(start.get("channels", 1))
+        dtype = STREAM_FORMATS.get(start.get("format", "f32le"))
+        settings = start.get("settings", {})
+        if dtype is None:
+            raise ValueError(f"Unknown format, choose one of {tuple(STREAM_FORMATS)}")
+        if sr <= 0 or channels <= 0:
+            raise ValueError("The sample rate and the number of channels must be positive")
+        unknown = set(settings) - set(STREAM_SETTINGS)
+        if unknown:
+            raise ValueError(f"Unknown settings: {sorted(unknown)}")
+        # without a peak, the samples are normalized by the running peak of the stream
+        peak = None if start.get("peak") is None else float(start["peak"])
+        framing = await streams.run(worker, _stream_open, stream_id, sr, settings, peak)
+        frame_bytes = channels * np.dtype(dtype).itemsize
+        max_chunk = int(STREAM_MAX_CHUNK_SECONDS * sr) * frame_bytes
+        await websocket.send_json({"type": "ready", **framing, "max_chunk_bytes": max_chunk})
+
+        chunk = 0
+        num_samples = 0
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            received = time.perf_counter()
+            finished = message.get("bytes") is None
+            if not finished:
+                data = message["bytes"]
+                if len(data) > max_chunk or len(data) % frame_bytes:
+                    raise ValueError(f"Chunks must be whole frames of at most {max_chunk} bytes")
+                samples = np.frombuffer(data, dtype=dtype).reshape(-1, channels).mean(axis=1)
+                if dtype == "<i2":
+                    samples = samples / 32768
+                num_samples += len(samples)
+                update = await streams.run(worker, _stream_push, stream_id, samples)
+            elif json.loads(message.get("text") or "{}").get("type") == "end":
+                update = await streams.run(worker, _stream_flush, stream_id)
+            else:
+                raise ValueError("Expected audio or an end message")
+            latency = time.perf_counter() - received
+            await websocket.send_json(_stream_update(update, chunk, latency))
+            streams.record(latency)
+            latencies.append(latency)
+            chunk += 1
+            if finished:
+                await websocket.send_json({
+                    "type": "summary",
+                    "blocks": update.first_block + len(update.y_pred),
+                    "duration": num_samples / sr,
+                    "latency": _latency_summary(latencies)
+                })
+                await websocket.close()
+                break
+    except WebSocketDisconnect:
+        pass
+    except (KeyError, TypeError, ValueError) as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1003)
+    except Exception:
+        logger.exception("Stream %s failed", stream_id)
+        try:
+            await websocket.send_json({"type": "error", "detail": "Internal error"})
+            await websocket.close(code=1011)
+        except Exception:
+            # the client is gone already
+            pass
+    finally:
+        await streams.release(worker, stream_id)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Load of the analysis worker pool, the number of kept analyses and of jobs per status."""
+    return {**pool.metrics(), "sessions": len(sessions), "jobs": get_job_store().counts(),
+            "streams": streams.metrics()}
+
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root():
@@ -1 +1,2 @@
-from .feature_extraction import calculate_features, calculate_features_for_folder, get_feature_list, WINDOW_MAPPING, blockwise_feature_calculation
+from .feature_extraction import calculate_features, calculate_features_for_folder, get_feature_list, WINDOW_MAPPING, blockwise_feature_calculation, calculate_block_features, BlockAnalysis, FEATURE_DEPENDENCIES, get_required_intermediates
+from .whole_file import calculate_track_features
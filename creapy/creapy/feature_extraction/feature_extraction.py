@@ -11,25 +11,85 @@ import soundfile as sf
 from scipy import interpolate
 from scipy.signal.windows import hamming, hann, kaiser
 from rich.progress import track
-from ..utils import get_config
+from ..utils import get_config, get_config_snapshot
 
 
-def _cpp(data: np.ndarray, sound: pm.Sound, sr: int,
-         config: Optional[dict] = None) -> float:
+class BlockAnalysis:
+    """Praat analyses (intermediates) of a single block.
+
+    Every intermediate is computed at most once and shared by all features that
+    depend on it (see `FEATURE_DEPENDENCIES`). The feature calculations compute
+    exactly the intermediates their features need up front, see
+    `get_required_intermediates`. A failed analysis is remembered as well, so that
+    every dependent feature sees the same error.
+    """
+
+    def __init__(self, data: np.ndarray, sr: int, sound: Optional[pm.Sound] = None):
+        self.data = data
+        self.sr = sr
+        self._results: dict[str, tuple[bool, object]] = {}
+        if sound is not None:
+            self._results["sound"] = True, sound
+
+    def get(self, intermediate: str):
+        if intermediate not in self._results:
+            try:
+                self._results[intermediate] = True, INTERMEDIATES[intermediate](self)
+            except Exception as e:
+                self._results[intermediate] = False, e
+        succeeded, result = self._results[intermediate]
+        if not succeeded:
+            raise result
+        return result
+
+    def prepare(self, intermediates: list[str]):
+        """Computes the given intermediates, failures are raised by `get` later on."""
+        for intermediate in intermediates:
+            if intermediate not in self._results:
+                try:
+                    self.get(intermediate)
+                except Exception:
+                    pass
+
+    @property
+    def sound(self) -> pm.Sound:
+        return self.get("sound")
+
+
+def _sound(analysis: BlockAnalysis) -> pm.Sound:
+    return pm.Sound(values=analysis.data, sampling_frequency=analysis.sr)
+
+
+def _pitch(analysis: BlockAnalysis) -> pm.Pitch:
+    return analysis.sound.to_pitch(analysis.sound.duration)
+
+
+def _spectrum(analysis: BlockAnalysis) -> pm.Spectrum:
+    return analysis.sound.to_spectrum()
+
+
+def _point_process(analysis: BlockAnalysis) -> pm.Data:
+    return pm.praat.call(analysis.sound, "To PointProcess (periodic, cc)", 75, 500)
+
+
+def _harmonicity(analysis: BlockAnalysis) -> pm.Harmonicity:
+    return analysis.sound.to_harmonicity()
+
+
+def _cpp(analysis: BlockAnalysis, config: Optional[dict] = None) -> float:
     """Calculates the cepstral peak prominence using praat
 
     Args:
-        data (np.ndarray): The sound data
-        sr (int): The sampling rate
+        analysis (BlockAnalysis): The analysis of the block
         config (dict, optional): The default configuration file. Defaults to None.
 
     Returns:
         float: The cepstral peak prominence
     """
     if config is None:
-        config = get_config()
+        config = get_config_snapshot()
 
-    spectrum = sound.to_spectrum()
+    spectrum = analysis.get("spectrum")
     power_cepstrum = pm.praat.call(spectrum, 'To PowerCepstrum')
 
     *args, = map(config["FEATURE_EXTRACTION"]["VALUES"]["CPP"].get, [
@@ -40,14 +100,13 @@ def _cpp(data: np.ndarray, sound: pm.Sound, sr: int,
     return cpp
 
 
-def _h1_h2(data: np.ndarray, sound: pm.Sound, sr: int,
-           config: Optional[dict] = None) -> float:
+def _h1_h2(analysis: BlockAnalysis, config: Optional[dict] = None) -> float:
     # if config is None:
     #     config = get_config()
 
     try:
-        pitch = sound.to_pitch(sound.duration)
-        spectrum = sound.to_spectrum()
+        pitch = analysis.get("pitch")
+        spectrum = analysis.get("spectrum")
         h1 = pitch.selected_array[0][0]
         h2 = h1 * 2
 
@@ -62,10 +121,9 @@ def _h1_h2(data: np.ndarray, sound: pm.Sound, sr: int,
     return h1_amp - h2_amp
 
 
-def _hnr(data: np.ndarray, sound: pm.Sound, sr: int,
-         config: Optional[dict] = None) -> float:
+def _hnr(analysis: BlockAnalysis, config: Optional[dict] = None) -> float:
     try:
-        harmonicity = sound.to_harmonicity()
+        harmonicity = analysis.get("harmonicity")
     except pm.PraatError:
         hnr = np.nan
     else:
@@ -75,11 +133,9 @@ def _hnr(data: np.ndarray, sound: pm.Sound, sr: int,
     return hnr
 
 
-def _jitter(data: np.ndarray, sound: pm.Sound, sr: int,
-            config: Optional[dict] = None) -> float:
+def _jitter(analysis: BlockAnalysis, config: Optional[dict] = None) -> float:
     try:
-        pointProcess = pm.praat.call(
-            sound, "To PointProcess (periodic, cc)", 75, 500)
+        pointProcess = analysis.get("point_process")
         local_jitter = pm.praat.call(
             pointProcess, "Get jitter (local)", 0, 0, 0.0001, 0.02, 1.3)
     except:
@@ -88,35 +144,30 @@ def _jitter(data: np.ndarray, sound: pm.Sound, sr: int,
     return local_jitter
 
 
-def _shimmer(data: np.ndarray, sound: pm.Sound, sr: int,
-             config: Optional[dict] = None) -> float:
+def _shimmer(analysis: BlockAnalysis, config: Optional[dict] = None) -> float:
     try:
-        pointProcess = pm.praat.call(
-            sound, "To PointProcess (periodic, cc)", 75, 500)
+        pointProcess = analysis.get("point_process")
         local_shimmer = pm.praat.call(
-            [sound, pointProcess], "Get shimmer (local)", 0, 0, 0.0001, 0.02, 1.3, 1.6)
+            [analysis.sound, pointProcess], "Get shimmer (local)", 0, 0, 0.0001, 0.02, 1.3, 1.6)
     except:
         local_shimmer = np.nan
 
     return local_shimmer
 
 
-def _f0mean(data: np.ndarray, sound: pm.Sound, sr: int,
-            config: Optional[dict] = None) -> float:
+def _f0mean(analysis: BlockAnalysis, config: Optional[dict] = None) -> float:
     try:
-        pitch = sound.to_pitch(sound.duration).selected_array[0][0]
+        pitch = analysis.get("pitch").selected_array[0][0]
     except:
         pitch = np.nan
 
     return pitch
 
 
-def _zcr(data: np.ndarray, sound: pm.Sound, sr: int,
-         config: Optional[dict] = None):
+def _zcr(analysis: BlockAnalysis, config: Optional[dict] = None):
     """
     calculates the Zero-Crossing-Rate (ZCR)
-    @param data: buffer signal data with blocklength N in form of an array of shape N data num_blocks
-    @param w: Window with length N
+    @param analysis: analysis of a block with blocklength N
     @return Zero-Crossing-rate 
 
     """
@@ -126,18 +177,17 @@ def _zcr(data: np.ndarray, sound: pm.Sound, sr: int,
     #                    ["VALUES"]["ZCR"]["window"]](data.shape[0])
 
     # sgn = lambda data: 1 if data >= 0 else -1
+    data = analysis.data
     sign_arr = np.sign(data)
     sign_arr[sign_arr == 0] = 1
     N = data.shape[0]
     return 0.5 * np.sum(np.abs(np.diff(sign_arr))) / N
 
 
-def _ste(data: np.ndarray, sound: pm.Sound, sr: int,
-         config: Optional[dict] = None):
+def _ste(analysis: BlockAnalysis, config: Optional[dict] = None):
     """
     calculates the short-term-energy (STE)
-    @param x: buffer signal x with blocklength N in form of an array of shape N x num_blocks
-    @param w: Window with length N, shape (N,)
+    @param analysis: analysis of a block with blocklength N
     @return short-term-energy
     """
     # assert len(w) == x.shape[0], "Dimension Mismatch: Windowlength != blocklength"
@@ -149,6 +199,7 @@ def _ste(data: np.ndarray, sound: pm.Sound, sr: int,
     # if w is None:
     #     w = WINDOW_MAPPING[config["FEATURE_EXTRACTION"]
     #                        ["VALUES"]["STE"]["window"]](data.shape[0])
+    data = analysis.data
     N = data.shape[0]
     return np.sum(data ** 2) / N
     # return np.sum(np.abs(data)) / N
@@ -156,37 +207,68 @@ def _ste(data: np.ndarray, sound: pm.Sound, sr: int,
 
 def get_feature_list(config: Optional[dict] = None) -> list[str]:
     if config is None:
-        config = get_config()
+        config = get_config_snapshot()
     return [key for key, value in config["FEATURE_EXTRACTION"].items() if value is True]
 
 
+def get_required_intermediates(features: list[str]) -> list[str]:
+    """Returns the Praat analyses needed to calculate the given features, in the
+    order they have to be computed."""
+    required = {intermediate for feature in features
+                for intermediate in FEATURE_DEPENDENCIES[feature]}
+    if required:
+        # every analysis is derived from the sound of the block
+        required.add("sound")
+    return [intermediate for intermediate in INTERMEDIATES if intermediate in required]
+
+
 def calculate_features(data: np.ndarray, sr: int,
                        return_header: bool = False,
                        config: Optional[dict] = None,
                        features: Optional[list[str]] = None) -> tuple[np.ndarray, list] | np.ndarray:
     if config is None:
-        config = get_config()
+        config = get_config_snapshot()
     if features is None:
         features = get_feature_list(config)
-    sound = pm.Sound(values=data, sampling_frequency=sr)
-    result = np.array([FEATURE_MAPPING[feature](data, sound, sr, config=config)
+    analysis = BlockAnalysis(data, sr)
+    analysis.prepare(get_required_intermediates(features))
+    result = np.array([FEATURE_MAPPING[feature](analysis, config=config)
                       for feature in features])
 
     return (result, features) if return_header is True else result
 
 
-def blockwise_feature_calculation(data: np.ndarray, sr,
-                                  feature, config: Optional[dict] = None):
+def calculate_block_features(data: np.ndarray, sr: int, features: list[str],
+                             config: Optional[dict] = None) -> np.ndarray:
+    """Calculates several features for each block, sharing the Praat analyses
+    of a block between the features.
+
+    Args:
+        data (np.ndarray): Blocks of shape (num_blocks, N).
+        sr (int): The sampling rate.
+        features (list[str]): The features to calculate.
+        config (dict, optional): The configuration. Defaults to None.
+
+    Returns:
+        np.ndarray: Feature values of shape (num_blocks, num_features), of the dtype of
+        floating point blocks.
+    """
     if config is None:
-        config = get_config()
+        config = get_config_snapshot()
+    functions = [FEATURE_MAPPING[feature] for feature in features]
+    intermediates = get_required_intermediates(features)
+    dtype = data.dtype if np.issubdtype(data.dtype, np.floating) else np.float64
+    res = np.empty((len(data), len(features)), dtype=dtype)
+    for i, block in enumerate(data):
+        analysis = BlockAnalysis(block, sr)
+        analysis.prepare(intermediates)
+        res[i] = [function(analysis, config) for function in functions]
+    return res
+
 
-    sounds = [pm.Sound(values=block, sampling_frequency=sr) for block in data]
-    function = FEATURE_MAPPING[feature]
-    res = []
-    # for block, sound in zip(track(data, description=f"Calculating {feature}"), sounds):
-    #     res.append(function(block, sound, sr))
-    res = [function(block, sound, sr) for block, sound in zip(data, sounds)]
-    return np.array(res)
+def blockwise_feature_calculation(data: np.ndarray, sr,
+                                  feature, config: Optional[dict] = None):
+    return calculate_block_features(data, sr, [feature], config)[:, 0]
 
 
 def calculate_features_for_folder(path: str,
@@ -206,6 +288,24 @@ def calculate_features_for_folder(path: str,
     return pd.DataFrame(feature_matrix, columns=features), pd.Series(target_vector)
 
 
+INTERMEDIATES = {
+    "sound": _sound,
+    "pitch": _pitch,
+    "spectrum": _spectrum,
+    "point_process": _point_process,
+    "harmonicity": _harmonicity,
+}
+# Praat analyses each feature is derived from
+FEATURE_DEPENDENCIES = {
+    "cpp": ("spectrum",),
+    "hnr": ("harmonicity",),
+    "h1h2": ("pitch", "spectrum"),
+    "jitter": ("point_process",),
+    "shimmer": ("sound", "point_process"),
+    "f0mean": ("pitch",),
+    "zcr": (),
+    "ste": (),
+}
 FEATURE_MAPPING = {
     "cpp": _cpp,
     "hnr": _hnr,
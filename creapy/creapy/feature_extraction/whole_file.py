@@ -0,0 +1,178 @@
+"""Whole-file feature extraction.
+
+Instead of analysing every block on its own, the pitch, harmonicity and the
+periodic point process are computed once for the signal, or rather once for
+every region of consecutive classified blocks. The features of a block are then
+aggregated from the parts of these tracks that fall into the block:
+
+- f0mean: mean of the voiced pitch frames (0 if no frame is voiced)
+- hnr: mean of the defined harmonicity frames
+- jitter, shimmer: Praat's local jitter/shimmer of the point process, restricted
+  to the time range of the block
+- h1h2: spectrum amplitude difference at f0 and 2 * f0, using the block's f0mean
+  and a batched FFT of the windowed blocks
+
+Features without a track based implementation are calculated blockwise.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+import parselmouth as pm
+
+from ..utils import get_config_snapshot
+from .feature_extraction import calculate_block_features, get_required_intermediates
+
+TRACK_FEATURES = ("f0mean", "hnr", "jitter", "shimmer", "h1h2")
+
+# number of blocks processed at once by the batched FFT
+_BLOCKS_PER_STEP = 4096
+
+
+def _windowed_mean(times: np.ndarray, values: np.ndarray, valid: np.ndarray,
+                   t_start: np.ndarray, t_end: np.ndarray, empty: float) -> np.ndarray:
+    """Mean of the valid track values with a time in [t_start, t_end) for every block."""
+    values = np.where(valid, values, 0.0)
+    value_sum = np.concatenate(([0.0], np.cumsum(values)))
+    count = np.concatenate(([0], np.cumsum(valid)))
+    lo = np.searchsorted(times, t_start, side="left")
+    hi = np.searchsorted(times, t_end, side="left")
+    n = count[hi] - count[lo]
+    res = np.full(t_start.shape, empty, dtype=np.float64)
+    np.divide(value_sum[hi] - value_sum[lo], n, out=res, where=n > 0)
+    return res
+
+
+def _range_query(command: str, objects, t_start: np.ndarray, t_end: np.ndarray,
+                 *args) -> np.ndarray:
+    res = np.empty(t_start.shape)
+    for i, (t0, t1) in enumerate(zip(t_start, t_end)):
+        try:
+            res[i] = pm.praat.call(objects, command, t0, t1, *args)
+        except pm.PraatError:
+            res[i] = np.nan
+    return res
+
+
+def _h1_h2(blocks: np.ndarray, sr: int, f0: np.ndarray) -> np.ndarray:
+    """H1-H2 of windowed blocks given their fundamental frequencies.
+
+    The amplitude spectrum equals Praat's `Sound.to_spectrum` (FFT length of the
+    next power of two, scaled by the sampling period). Amplitudes are
+    interpolated quadratically from the three bins closest to the frequency.
+    Blocks with an undefined f0 have an undefined H1-H2.
+    """
+    undefined = np.isnan(f0)
+    f0 = np.where(undefined, 0.0, f0)
+    N = blocks.shape[1]
+    nfft = 1 << int(np.ceil(np.log2(N)))
+    df = sr / nfft
+    res = np.empty(blocks.shape[0], dtype=blocks.dtype)
+    for i in range(0, blocks.shape[0], _BLOCKS_PER_STEP):
+        amplitude = np.abs(np.fft.rfft(blocks[i:i + _BLOCKS_PER_STEP], n=nfft, axis=1)) / sr
+        _f0 = f0[i:i + _BLOCKS_PER_STEP]
+        rows = np.arange(amplitude.shape[0])
+        h = []
+        for f in (_f0, 2 * _f0):
+            pos = f / df
+            center = np.clip(np.round(pos).astype(int), 1, amplitude.shape[1] - 2)
+            x = pos - center
+            y0, y1, y2 = (amplitude[rows, center + k] for k in (-1, 0, 1))
+            h.append(y1 + x * (y2 - y0) / 2 + x ** 2 * (y2 - 2 * y1 + y0) / 2)
+        res[i:i + _BLOCKS_PER_STEP] = h[0] - h[1]
+    res[undefined] = np.nan
+    return res
+
+
+def _analyse(function, *args, **kwargs):
+    """Runs a Praat analysis of a region, None if it failed."""
+    try:
+        return function(*args, **kwargs)
+    except pm.PraatError:
+        return None
+
+
+def _regions(block_starts: np.ndarray, N: int) -> list[slice]:
+    """Groups blocks that overlap or touch into regions."""
+    breaks = np.flatnonzero(np.diff(block_starts) > N) + 1
+    bounds = np.concatenate(([0], breaks, [len(block_starts)]))
+    return [slice(lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+
+def calculate_track_features(data: np.ndarray, sr: int, block_starts: np.ndarray,
+                             blocks: np.ndarray, features: list[str],
+                             config: Optional[dict] = None, start_sample: int = 0) -> np.ndarray:
+    """Calculates features of blocks from analyses of the signal they are taken from.
+
+    The analyses run once per region of overlapping blocks (e.g. once for the
+    whole file if all blocks are given), padded by half a block on both sides.
+
+    Args:
+        data (np.ndarray): The (unwindowed) signal the blocks are taken from.
+        sr (int): The sampling rate.
+        block_starts (np.ndarray): First sample of each block in `data`, ascending.
+        blocks (np.ndarray): The windowed blocks of shape (num_blocks, N).
+        features (list[str]): The features to calculate.
+        config (dict, optional): The configuration. Defaults to None.
+        start_sample (int, optional): Position of `data` in the analysed signal, so
+            that the analyses of a part of a signal match those of the whole signal.
+            Defaults to 0.
+
+    Returns:
+        np.ndarray: Feature values of shape (num_blocks, num_features).
+    """
+    if config is None:
+        config = get_config_snapshot()
+    res = np.empty((len(block_starts), len(features)), dtype=blocks.dtype)
+    if len(block_starts) == 0:
+        return res
+    block_starts = np.asarray(block_starts)
+    N = blocks.shape[1]
+    hop_size = config["USER"]["hop_size"]
+    t_start = (block_starts + start_sample) / sr
+    t_end = t_start + N / sr
+    track_columns = [i for i, feature in enumerate(features) if feature in TRACK_FEATURES]
+    intermediates = get_required_intermediates([feature for feature in features if feature in TRACK_FEATURES])
+    f0 = np.zeros(len(block_starts))
+
+    for region in _regions(block_starts, N):
+        lo = max(block_starts[region.start] - N // 2, 0)
+        hi = min(block_starts[region.stop - 1] + N + N // 2, len(data))
+        sound = pm.Sound(values=data[lo:hi], sampling_frequency=sr, start_time=(lo + start_sample) / sr)
+        _t_start, _t_end = t_start[region], t_end[region]
+        # like the blockwise features, a failed analysis (e.g. of a too short region)
+        # results in undefined values of the features derived from it
+        pitch = _analyse(sound.to_pitch, time_step=hop_size) if "pitch" in intermediates else None
+        harmonicity = _analyse(sound.to_harmonicity, time_step=hop_size) if "harmonicity" in intermediates else None
+        point_process = (_analyse(pm.praat.call, sound, "To PointProcess (periodic, cc)", 75, 500)
+                         if "point_process" in intermediates else None)
+        if pitch is not None:
+            frequency = pitch.selected_array["frequency"]
+            f0[region] = _windowed_mean(pitch.xs(), frequency, frequency > 0,
+                                        _t_start, _t_end, empty=0.0)
+        else:
+            f0[region] = np.nan
+        for i in track_columns:
+            feature = features[i]
+            if feature == "f0mean":
+                res[region, i] = f0[region]
+            elif feature == "hnr" and harmonicity is not None:
+                values = harmonicity.values[0]
+                res[region, i] = _windowed_mean(harmonicity.xs(), values, values != -200,
+                                                _t_start, _t_end, empty=np.nan)
+            elif feature == "jitter" and point_process is not None:
+                res[region, i] = _range_query("Get jitter (local)", point_process,
+                                              _t_start, _t_end, 0.0001, 0.02, 1.3)
+            elif feature == "shimmer" and point_process is not None:
+                res[region, i] = _range_query("Get shimmer (local)", [sound, point_process],
+                                              _t_start, _t_end, 0.0001, 0.02, 1.3, 1.6)
+            elif feature != "h1h2":
+                res[region, i] = np.nan
+
+    for i, feature in enumerate(features):
+        if feature == "h1h2":
+            res[:, i] = _h1_h2(blocks, sr, f0)
+        elif feature not in TRACK_FEATURES:
+            res[:, i] = calculate_block_features(blocks, sr, [feature], config)[:, 0]
+    return res
@@ -1,5 +1,10 @@
 from re import S
 from .model import Model, load_model
-from .preprocessing import impute, split_data, buffer
+from .artifact import save_artifact, load_artifact, convert_model, convert_training_models
+from .registry import ModelRegistry, model_registry, get_model, get_model_path, preload_models, invalidate_models, GENDER_MODELS
+from .preprocessing import impute, split_data, buffer, frame_signal, get_signal_dtype, SIGNAL_DTYPES
 from .postprocessing import moving_average
-from .classify import process_file, process_folder
+from .gating import calculate_gating_features, get_gating_features, get_included_indices
+from .classify import process_array, process_file, process_folder, write_csv, write_textgrid
+from .analysis import Analysis, Classification, FRAMING_SETTINGS
+from .stream import StreamAnalysis, StreamUpdate
@@ -0,0 +1,233 @@
+"""Repeated classification of a decoded signal.
+
+An `Analysis` keeps the per-block state of a signal: the gating values of all
+blocks and the classification features of every block that was included by
+the gating so far. Evaluating it again with other thresholds or another gender
+model only calculates the features of newly included blocks, a change of the
+creak threshold only recomputes the intervals. The result of an evaluation is a
+`Classification` of the blocks.
+"""
+from __future__ import annotations
+
+import warnings
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+from scipy.signal.windows import hann
+
+from ..feature_extraction.feature_extraction import calculate_block_features
+from ..feature_extraction.whole_file import calculate_track_features
+from ..utils.config import apply_settings, get_config
+from ..utils.executor import map_frames
+from ..utils.helpers import get_creak_interval_array, get_time_vector
+from .gating import calculate_gating_features, get_gating_features, get_included_indices
+from .preprocessing import get_signal_dtype
+from .registry import get_model
+
+# settings that change the blocks, they require a new analysis
+FRAMING_SETTINGS = ("block_size", "hop_size", "audio_start", "audio_end", "normalization")
+
+# number of blocks framed at once while calculating the gating values
+_BLOCKS_PER_STEP = 4096
+
+
+class Classification(NamedTuple):
+    """The result of classifying a signal, see `process_array`.
+
+    Attributes:
+        time (np.ndarray): The center time of each block in seconds.
+        included (np.ndarray): Whether each block was included by the gating.
+        X (pd.DataFrame): The gating features of all blocks and the classification
+            features of the included blocks, NaN for the others.
+        y_pred (np.ndarray): The creak probability of each block, 0 for excluded blocks.
+        sr (int): The sampling rate.
+    """
+    time: np.ndarray
+    included: np.ndarray
+    X: pd.DataFrame
+    y_pred: np.ndarray
+    sr: int
+
+    @classmethod
+    def from_features(cls, sr: int, gating_values: np.ndarray, included: np.ndarray,
+                      X: pd.DataFrame, gender_model: Optional[str] = None,
+                      config: Optional[dict] = None, start_time: float = 0.0) -> Classification:
+        """Classifies the blocks given their gating values and the features of the included blocks.
+
+        Args:
+            sr (int): The sampling rate.
+            gating_values (np.ndarray): The gating features of all blocks.
+            included (np.ndarray): The gating mask.
+            X (pd.DataFrame): The classification features of the included blocks,
+                indexed by block.
+            gender_model (str, optional): The model, defaults to the `gender_model` setting.
+            config (dict, optional): The configuration, read from the config files if not given.
+            start_time (float, optional): Time of the first sample in seconds. Defaults to 0.
+        """
+        config = get_config() if config is None else config
+        X_test = pd.concat((pd.DataFrame(gating_values, columns=get_gating_features(config)), X),
+                           axis=1)
+        y_pred = np.zeros(included.shape[0], dtype=get_signal_dtype(config))
+        if included.any():
+            y_pred[included] = get_model(gender_model, config).predict(X, config=config)
+        else:
+            warnings.warn("Did not make classification. Consider setting new values "
+                          "for Zero-Crossing-Rate (zcr) or Short-Term-Energy (ste).")
+        time = get_time_vector(y_pred, sr, start_time, config=config)
+        return cls(time, included, X_test, y_pred, sr)
+
+
+class Analysis:
+    """Per-block features of a normalized signal for repeated classification.
+
+    Args:
+        data (np.ndarray): The normalized signal.
+        sr (int): The sampling rate.
+        settings (dict, optional): User settings, see `process_file`. Defaults to None.
+        config (dict, optional): The configuration, read from the config files if not given.
+        start_time (float, optional): Time of the first sample in seconds, used for the
+            creak intervals. Defaults to 0.
+    """
+
+    def __init__(self, data: np.ndarray, sr: int, settings: Optional[dict] = None,
+                 config: Optional[dict] = None, start_time: float = 0.0):
+        self.config = apply_settings(settings, config)
+        self.sr = sr
+        self.start_time = start_time
+        dtype = get_signal_dtype(self.config)
+        self.data = np.asarray(data, dtype=dtype)
+        self.N = int(self.config['USER']["block_size"] * sr)
+        self.R = int(self.config['USER']["hop_size"] * sr)
+        if self.N <= 0 or self.R <= 0:
+            raise ValueError(f"The block size ({self.N} samples) and the hop size ({self.R} samples) "
+                             f"must be at least one sample")
+        self.window = hann(self.N).astype(dtype)
+        self.num_blocks = int(np.ceil((len(self.data) - self.N) / self.R + 1))
+        if self.num_blocks < 1:
+            raise ValueError(f"The signal of {len(self.data)} samples is too short to be "
+                             f"framed into blocks of {self.N} samples")
+        # strided view of the complete blocks, like `frame_signal`
+        self._blocks = np.lib.stride_tricks.sliding_window_view(
+            self.data[:(self.num_blocks - 2) * self.R + self.N], self.N)[::self.R] \
+            if self.num_blocks > 1 else np.empty((0, self.N), dtype=dtype)
+        self.gating_features = get_gating_features(self.config)
+        self.features = list(self.config["MODEL"]["FEATURES"]["for_classification"])
+
+        self.gating_values = np.concatenate([
+            calculate_gating_features(
+                self.frames(np.arange(i, min(i + _BLOCKS_PER_STEP, self.num_blocks))),
+                sr, self.gating_features, self.config)
+            for i in range(0, self.num_blocks, _BLOCKS_PER_STEP)])
+        self._feature_values = np.full((self.num_blocks, len(self.features)), np.nan, dtype=dtype)
+        self._calculated = np.zeros(self.num_blocks, dtype=bool)
+
+    @classmethod
+    def from_signal(cls, signal: np.ndarray, sr: int, settings: Optional[dict] = None,
+                    config: Optional[dict] = None) -> Analysis:
+        """Creates the analysis of the part of a whole, unnormalized mono signal selected
+        by the `audio_start`, `audio_end` and `normalization` settings, like `read_wav`.
+        """
+        config = apply_settings(settings, config)
+        start, end = config['USER']['audio_start'], config['USER']['audio_end']
+        first, last, _ = slice(int(start * sr), None if end == -1 else int(end * sr)).indices(len(signal))
+        data = np.array(signal[first:max(last, first)], dtype=get_signal_dtype(config))
+        if config['USER'].get('normalization', 'global') == "local":
+            peak = np.max(np.abs(data)) if data.size else 1.0
+        else:
+            peak = np.max(np.abs(signal))
+        data /= peak
+        return cls(data, sr, config=config, start_time=start)
+
+    def frames(self, indices: np.ndarray) -> np.ndarray:
+        """Returns the blocks with the given indices, equal to the rows of `frame_signal`."""
+        indices = np.asarray(indices, dtype=np.intp)
+        res = np.zeros((indices.size, self.N), dtype=self.window.dtype)
+        is_last = indices == self.num_blocks - 1
+        if len(self._blocks):
+            # the rows are copied from the strided view straight into the result
+            np.take(self._blocks, np.where(is_last, 0, indices), axis=0, out=res)
+            res *= self.window
+        if is_last.any():
+            # the last block is zero-padded and not windowed
+            last = self.data[(self.num_blocks - 1) * self.R:]
+            res[is_last] = 0
+            res[is_last, :last.size] = last
+        return res
+
+    def classification_features(self, indices: np.ndarray, config: Optional[dict] = None) -> np.ndarray:
+        """Returns the classification features of the blocks, calculating those not known yet.
+
+        In the whole-file extraction mode the features depend on the neighbouring
+        blocks, so they are calculated on every call.
+        """
+        config = self.config if config is None else config
+        indices = np.asarray(indices, dtype=np.intp)
+        if config["FEATURE_EXTRACTION"].get("mode", "blockwise") == "whole_file":
+            return calculate_track_features(self.data, self.sr, indices * self.R,
+                                            self.frames(indices), self.features, config)
+        missing = indices[~self._calculated[indices]]
+        if missing.size:
+            self._feature_values[missing], _ = map_frames(
+                calculate_block_features, self.frames(missing),
+                args=(self.sr, self.features, config), config=config)
+            self._calculated[missing] = True
+        return self._feature_values[indices]
+
+    def _evaluation_config(self, settings: Optional[dict]) -> dict:
+        config = apply_settings(settings, self.config)
+        changed = [key for key in FRAMING_SETTINGS
+                   if config['USER'].get(key) != self.config['USER'].get(key)]
+        if changed:
+            raise ValueError(f"Changing {changed} requires a new analysis")
+        return config
+
+    def classify(self, settings: Optional[dict] = None,
+                 gender_model: Optional[str] = None) -> Classification:
+        """Classifies the blocks with the given gating thresholds and gender model.
+
+        Args:
+            settings (dict, optional): User settings of this evaluation, e.g. `zcr_threshold`,
+                `ste_threshold` or `gender_model`. Settings that change the blocks (see
+                `FRAMING_SETTINGS`) can't be changed. Defaults to None.
+            gender_model (str, optional): The model, defaults to the `gender_model` setting.
+
+        Raises:
+            ValueError: If a setting that changes the blocks differs from the analysis.
+
+        Returns:
+            Classification: The block times, gating mask, features and creak probabilities.
+        """
+        config = self._evaluation_config(settings)
+        # a copy, the zcr is normalized in place
+        gating_values = self.gating_values.copy()
+        included_indices = get_included_indices(gating_values, self.gating_features, config)
+        included = np.flatnonzero(included_indices)
+        X = pd.DataFrame(self.classification_features(included, config),
+                         columns=self.features, index=included)
+        return Classification.from_features(self.sr, gating_values, included_indices, X,
+                                            gender_model, config, self.start_time)
+
+    def evaluate(self, settings: Optional[dict] = None) -> tuple[pd.DataFrame, np.ndarray]:
+        """Classifies the blocks, see `classify`.
+
+        Returns:
+            tuple[pd.DataFrame, np.ndarray]: The features and the creak probability per
+            block, like `process_file`.
+        """
+        result = self.classify(settings)
+        return result.X, result.y_pred
+
+    def time_vector(self, y_pred: np.ndarray) -> np.ndarray:
+        """Returns the time of each block in seconds, see `get_time_vector`."""
+        return get_time_vector(y_pred, self.sr, self.start_time, config=self.config)
+
+    def intervals(self, y_pred: np.ndarray, settings: Optional[dict] = None) -> np.ndarray:
+        """Returns the creak intervals of the probabilities as array of (start, end) times.
+
+        Args:
+            y_pred (np.ndarray): The creak probability per block.
+            settings (dict, optional): User settings, e.g. `creak_threshold`. Defaults to None.
+        """
+        config = self._evaluation_config(settings)
+        return get_creak_interval_array(y_pred, self.time_vector(y_pred), config=config)
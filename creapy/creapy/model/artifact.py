@@ -0,0 +1,325 @@
+"""Pre-fitted model artifacts.
+
+An artifact is an uncompressed `.npz` archive holding the fitted classifier
+(the flattened decision trees of a random forest or the weights of a MLP), the
+imputer statistics, the feature order and a versioned header. Loading an
+artifact only reads a handful of arrays, it neither refits the model nor needs
+pickle.
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.neural_network import MLPClassifier
+
+from ..utils import get_config, get_root
+
+ARTIFACT_FORMAT = "creapy-model"
+ARTIFACT_VERSION = 1
+ARTIFACT_SUFFIX = ".npz"
+# samples evaluated at once, a forest walks n_trees x PREDICT_CHUNK_SIZE node indices
+PREDICT_CHUNK_SIZE = 8192
+
+
+class ArtifactError(Exception):
+    pass
+
+
+class ForestPredictor:
+    """Random forest inference on flattened decision trees.
+
+    All trees are stored in shared node arrays, `roots` holds the index of the
+    root node of each tree and `value` the class probabilities of each leaf.
+    """
+
+    def __init__(self, classes: np.ndarray, roots: np.ndarray, children_left: np.ndarray,
+                 children_right: np.ndarray, feature: np.ndarray, threshold: np.ndarray,
+                 value: np.ndarray, max_depth: int):
+        self.classes_ = classes
+        self.roots = roots
+        self.children_left = children_left
+        self.children_right = children_right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.max_depth = int(max_depth)
+
+    @classmethod
+    def from_estimator(cls, clf: RandomForestClassifier) -> ForestPredictor:
+        roots, left, right, feature, threshold, value = [], [], [], [], [], []
+        offset = 0
+        for estimator in clf.estimators_:
+            tree = estimator.tree_
+            is_leaf = tree.children_left == -1
+            roots.append(offset)
+            left.append(np.where(is_leaf, -1, tree.children_left + offset))
+            right.append(np.where(is_leaf, -1, tree.children_right + offset))
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(tree.threshold)
+            _value = tree.value[:, 0, :]
+            value.append(_value / _value.sum(axis=1, keepdims=True))
+            offset += tree.node_count
+        return cls(classes=clf.classes_,
+                   roots=np.array(roots, dtype=np.int64),
+                   children_left=np.concatenate(left).astype(np.int64),
+                   children_right=np.concatenate(right).astype(np.int64),
+                   feature=np.concatenate(feature).astype(np.int64),
+                   threshold=np.concatenate(threshold),
+                   value=np.concatenate(value),
+                   max_depth=max(estimator.tree_.max_depth for estimator in clf.estimators_))
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        return {"classes": np.asarray(self.classes_).astype(str), "roots": self.roots,
+                "children_left": self.children_left, "children_right": self.children_right,
+                "feature": self.feature, "threshold": self.threshold, "value": self.value,
+                "max_depth": np.array(self.max_depth)}
+
+    @classmethod
+    def from_arrays(cls, arrays) -> ForestPredictor:
+        return cls(**{key: arrays[key] for key in ("classes", "roots", "children_left",
+                                                   "children_right", "feature", "threshold",
+                                                   "value")},
+                   max_depth=arrays["max_depth"].item())
+
+    def predict_proba(self, X) -> np.ndarray:
+        # like sklearn, trees are evaluated on float32 features
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.shape[0] <= PREDICT_CHUNK_SIZE:
+            return self._predict_proba(X)
+        # the memory of the tree walk is bounded by evaluating the samples in chunks
+        return np.concatenate([self._predict_proba(X[start:start + PREDICT_CHUNK_SIZE])
+                               for start in range(0, X.shape[0], PREDICT_CHUNK_SIZE)])
+
+    def _predict_proba(self, X: np.ndarray) -> np.ndarray:
+        n_samples, n_features = X.shape
+        n_trees = self.roots.size
+        # one entry per (tree, sample), only entries not yet in a leaf are advanced
+        nodes = np.repeat(self.roots, n_samples)
+        offsets = np.tile(np.arange(n_samples) * n_features, n_trees)
+        active = np.arange(nodes.size)
+        X = X.ravel()
+        while active.size:
+            current = nodes[active]
+            left = self.children_left[current]
+            is_node = left != -1
+            active, current, left = active[is_node], current[is_node], left[is_node]
+            go_left = X[offsets[active] + self.feature[current]] <= self.threshold[current]
+            nodes[active] = np.where(go_left, left, self.children_right[current])
+        return self.value[nodes].reshape(n_trees, n_samples, -1).mean(axis=0)
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+class MLPPredictor:
+    """Forward pass of a fitted multi-layer perceptron."""
+
+    _activations = {
+        "identity": lambda x: x,
+        "logistic": lambda x: 1 / (1 + np.exp(-x)),
+        "tanh": np.tanh,
+        "relu": lambda x: np.maximum(x, 0),
+    }
+
+    def __init__(self, classes: np.ndarray, coefs: list[np.ndarray],
+                 intercepts: list[np.ndarray], activation: str, out_activation: str):
+        self.classes_ = classes
+        self.coefs = coefs
+        self.intercepts = intercepts
+        self.activation = activation
+        self.out_activation = out_activation
+
+    @classmethod
+    def from_estimator(cls, clf: MLPClassifier) -> MLPPredictor:
+        return cls(classes=clf.classes_, coefs=clf.coefs_, intercepts=clf.intercepts_,
+                   activation=clf.activation, out_activation=clf.out_activation_)
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        arrays = {"classes": np.asarray(self.classes_).astype(str),
+                  "activation": np.array(self.activation),
+                  "out_activation": np.array(self.out_activation)}
+        for i, (coef, intercept) in enumerate(zip(self.coefs, self.intercepts)):
+            arrays[f"coef_{i}"] = coef
+            arrays[f"intercept_{i}"] = intercept
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays) -> MLPPredictor:
+        n_layers = sum(1 for key in arrays.keys() if key.startswith("coef_"))
+        return cls(classes=arrays["classes"],
+                   coefs=[arrays[f"coef_{i}"] for i in range(n_layers)],
+                   intercepts=[arrays[f"intercept_{i}"] for i in range(n_layers)],
+                   activation=arrays["activation"].item(),
+                   out_activation=arrays["out_activation"].item())
+
+    def predict_proba(self, X) -> np.ndarray:
+        activation = np.asarray(X, dtype=np.float64)
+        for i, (coef, intercept) in enumerate(zip(self.coefs, self.intercepts)):
+            activation = activation @ coef + intercept
+            if i < len(self.coefs) - 1:
+                activation = self._activations[self.activation](activation)
+        if self.out_activation == "softmax":
+            activation = np.exp(activation - activation.max(axis=1, keepdims=True))
+            return activation / activation.sum(axis=1, keepdims=True)
+        activation = self._activations[self.out_activation](activation)
+        if activation.shape[1] == 1:
+            activation = np.hstack((1 - activation, activation))
+        return activation
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+class ImputerTransform:
+    """Replaces missing values with the statistics of a fitted `SimpleImputer`."""
+
+    def __init__(self, statistics: np.ndarray):
+        self.statistics_ = statistics
+
+    def transform(self, X) -> np.ndarray:
+        X = np.asarray(X)
+        if not np.issubdtype(X.dtype, np.floating):
+            X = X.astype(np.float64)
+        return np.where(np.isnan(X), self.statistics_.astype(X.dtype), X)
+
+
+_predictors = {
+    "rfc": ForestPredictor,
+    "mlp": MLPPredictor
+}
+
+
+def _clf_name(clf) -> str:
+    if isinstance(clf, (RandomForestClassifier, ForestPredictor)):
+        return "rfc"
+    if isinstance(clf, (MLPClassifier, MLPPredictor)):
+        return "mlp"
+    raise ArtifactError(f"Can't create an artifact of classifier {type(clf).__name__}")
+
+
+def save_artifact(model, filepath: str | Path) -> Path:
+    """Saves a fitted model as artifact.
+
+    Args:
+        model (Model): The fitted model.
+        filepath (str | Path): Destination path of the artifact.
+
+    Returns:
+        Path: The location of the written artifact.
+    """
+    from .. import __version__
+
+    filepath = Path(filepath).with_suffix(ARTIFACT_SUFFIX)
+    clf_name = _clf_name(model._clf)
+    predictor = model._clf
+    if not isinstance(predictor, _predictors[clf_name]):
+        predictor = _predictors[clf_name].from_estimator(predictor)
+    arrays = {f"clf/{key}": value for key, value in predictor.to_arrays().items()}
+    if hasattr(model, "_imputer"):
+        arrays["imputer/statistics"] = np.asarray(model._imputer.statistics_, dtype=np.float64)
+    header = {
+        "format": ARTIFACT_FORMAT,
+        "version": ARTIFACT_VERSION,
+        "creapy_version": __version__,
+        "clf": clf_name,
+        "features": list(model._features),
+    }
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(filepath, header=np.array(json.dumps(header)), **arrays)
+    return filepath
+
+
+def read_artifact_header(filepath: str | Path) -> dict:
+    """Reads the header of an artifact without loading the model.
+
+    Raises:
+        ArtifactError: If the file is not an artifact of a supported version.
+    """
+    with np.load(filepath, allow_pickle=False) as archive:
+        header = json.loads(archive["header"].item())
+    if header.get("format") != ARTIFACT_FORMAT:
+        raise ArtifactError(f"{filepath} is not a creapy model artifact")
+    if header.get("version") != ARTIFACT_VERSION:
+        raise ArtifactError(
+            f"Unsupported artifact version {header.get('version')} in {filepath}, "
+            f"expected {ARTIFACT_VERSION}")
+    return header
+
+
+def load_artifact(filepath: str | Path, config: Optional[dict] = None):
+    """Loads a fitted model from an artifact.
+
+    Args:
+        filepath (str | Path): Location of the artifact.
+        config (dict, optional): The configuration. Defaults to None.
+
+    Returns:
+        Model: Fitted Model for creak classification.
+    """
+    from .model import Model
+
+    header = read_artifact_header(filepath)
+    with np.load(filepath, allow_pickle=False) as archive:
+        clf_arrays = {key[len("clf/"):]: archive[key]
+                      for key in archive.files if key.startswith("clf/")}
+        statistics = archive["imputer/statistics"] if "imputer/statistics" in archive.files else None
+    model = Model(config)
+    model._features = header["features"]
+    model._clf = _predictors[header["clf"]].from_arrays(clf_arrays)
+    if statistics is not None:
+        model._imputer = ImputerTransform(statistics)
+    model._fitted = True
+    return model
+
+
+def artifact_matches_config(filepath: str | Path, config: Optional[dict] = None) -> bool:
+    """Checks whether an artifact was created with the classifier and features of the config."""
+    if config is None:
+        config = get_config()
+    try:
+        header = read_artifact_header(filepath)
+    except (ArtifactError, OSError, KeyError, ValueError):
+        return False
+    return (header["clf"] == config["MODEL"]["CLASSIFIER"]["clf"]
+            and header["features"] == list(config["MODEL"]["FEATURES"]["for_classification"]))
+
+
+def convert_model(csv_path: str | Path, dst: Optional[str | Path] = None) -> Path:
+    """Fits the model of a training csv file and saves it as artifact.
+
+    Args:
+        csv_path (str | Path): Location of the model csv file.
+        dst (str | Path, optional): Destination of the artifact. Defaults to the
+            csv path with `.npz` suffix.
+
+    Returns:
+        Path: The location of the written artifact.
+    """
+    from .model import load_model
+
+    csv_path = Path(csv_path)
+    if dst is None:
+        dst = csv_path.with_suffix(ARTIFACT_SUFFIX)
+    return save_artifact(load_model(csv_path), dst)
+
+
+def convert_training_models(config: Optional[dict] = None) -> list[Path]:
+    """Converts the shipped training models (`model_ALL`, `model_MALE`, `model_FEMALE`) to artifacts.
+
+    Returns:
+        list[Path]: The locations of the written artifacts.
+    """
+    if config is None:
+        config = get_config()
+    model_location = get_root() / config["MODEL"]["model_location"]
+    csv_paths = sorted(model_location.parent.glob(f"{model_location.stem}_*.csv"))
+    return [convert_model(csv_path) for csv_path in csv_paths]
+
+
+if __name__ == "__main__":
+    for artifact_path in convert_training_models():
+        print(f"Wrote model artifact at {artifact_path}")
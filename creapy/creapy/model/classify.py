@@ -1,136 +1,457 @@
 from __future__ import annotations
 
 import time
-import warnings
-from functools import partial
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
 from pathlib import Path
-# from threading import Thread
 from typing import Optional
 import os
 import numpy as np
 import pandas as pd
-from rich.progress import track
+import soundfile as sf
+from rich.progress import (BarColumn, MofNCompleteColumn, Progress, TextColumn,
+                           TimeElapsedColumn)
 from scipy.signal.windows import hann
 
-from ..feature_extraction import WINDOW_MAPPING
-from ..feature_extraction.feature_extraction import (
-    blockwise_feature_calculation, calculate_features, get_feature_list)
-from ..utils.config import get_config
-from ..utils.helpers import (ThreadWithReturnValue, get_creak_intervals,
-                             get_root, get_time_vector, intervals_to_textgrid,
-                             intervals_to_csv)
-from ..utils.read_wav import read_wav
-from .model import load_model
-from .postprocessing import thresholding
-from .preprocessing import buffer
+from ..feature_extraction.feature_extraction import calculate_block_features
+from ..feature_extraction.whole_file import calculate_track_features
+from ..utils.config import apply_settings, get_config
+from ..utils.executor import map_frames
+from ..utils.feature_cache import FeatureCache, feature_cache_key, get_feature_cache
+from ..utils.helpers import get_creak_intervals, intervals_to_textgrid, intervals_to_csv
+from ..utils.read_wav import NORMALIZATIONS, _to_mono, read_frames, read_wav, stream_peak
+from .analysis import Analysis, Classification
+from .registry import get_model
+from .gating import calculate_gating_features, get_gating_features, get_included_indices
+from .preprocessing import frame_signal, get_signal_dtype
+
+
+def _classification_features(data: np.ndarray, sr: int, block_starts: np.ndarray,
+                             blocks: np.ndarray, features: list[str], config: dict,
+                             start_sample: int = 0) -> np.ndarray:
+    """Calculates the classification features of the included blocks of a signal."""
+    if config["FEATURE_EXTRACTION"].get("mode", "blockwise") == "whole_file":
+        return calculate_track_features(data, sr, block_starts, blocks, features, config,
+                                        start_sample=start_sample)
+    return _blockwise_features(blocks, sr, features, config)
+
+
+def _blockwise_features(blocks: np.ndarray, sr: int, features: list[str],
+                        config: dict) -> np.ndarray:
+    # every chunk of blocks is processed with all features, so the Praat analyses
+    # of a block are shared between its features
+    res, timings = map_frames(calculate_block_features, blocks,
+                              args=(sr, features, config), config=config)
+    if config.get("EXECUTION", {}).get("report_timing", False):
+        for timing in timings:
+            print(f"blocks {timing.start}-{timing.stop} ({timing.worker}): "
+                  f"{timing.seconds:.3f} s")
+    return res
+
+
+def _analysed_range(audio_path, config: dict) -> tuple[int, int, int]:
+    """Returns the sampling rate and the first and last sample of the analysed part of a file."""
+    _info = sf.info(str(audio_path))
+    sr = _info.samplerate
+    start, end = config['USER']['audio_start'], config['USER']['audio_end']
+    first = min(int(start * sr), _info.frames)
+    last = _info.frames if end == -1 else min(max(int(end * sr), first), _info.frames)
+    return sr, first, last
+
+
+def _use_streaming(audio_path, config: dict) -> bool:
+    """Files are streamed if `EXECUTION.stream_chunk_seconds` is set and they are longer than a chunk."""
+    chunk_seconds = config.get("EXECUTION", {}).get("stream_chunk_seconds")
+    if not chunk_seconds:
+        return False
+    sr, first, last = _analysed_range(audio_path, config)
+    return last - first > 2 * chunk_seconds * sr
+
+
+def _stream_chunk_bounds(num_blocks: int, chunk_blocks: int,
+                         region_starts: Optional[np.ndarray] = None) -> list[tuple[int, int]]:
+    """Splits the blocks into chunks of about `chunk_blocks` blocks.
+
+    If `region_starts` are given, a chunk ends before the last region start within
+    it, so that regions of blocks are not split (unless a region is longer than a chunk).
+    """
+    bounds = []
+    b0 = 0
+    while b0 < num_blocks:
+        b1 = min(b0 + chunk_blocks, num_blocks)
+        if b1 < num_blocks and region_starts is not None:
+            i = np.searchsorted(region_starts, b1, side="right") - 1
+            if i >= 0 and region_starts[i] > b0:
+                b1 = int(region_starts[i])
+        bounds.append((b0, b1))
+        b0 = b1
+    return bounds
+
+
+def _read_blocks(audio_path, first: int, n: int, b0: int, b1: int, sr: int, window: np.ndarray,
+                 peak: float, config: dict, margin: int = 0) -> tuple[np.ndarray, int, np.ndarray]:
+    """Reads the blocks `b0` to `b1` of the analysed signal of `n` samples starting at `first`.
+
+    Block `b` starts at sample `b * R` of the analysed signal. The samples up to the
+    start of block `b1` plus a block are read, so that `frame_signal` windows all
+    blocks of the chunk and only the last block of the signal is zero-padded. The
+    read data is extended by `margin` samples on both sides.
+
+    Returns:
+        tuple[np.ndarray, int, np.ndarray]: The normalized data, the position of its first
+        sample in the analysed signal and the blocks of shape (b1 - b0, N).
+    """
+    N = len(window)
+    R = int(config['USER']["hop_size"] * sr)
+    lo = max(b0 * R - margin, 0)
+    hi = min(b1 * R + N + margin, n)
+    data = read_frames(audio_path, first + lo, first + hi, dtype=window.dtype.name)
+    data /= peak
+    blocks = frame_signal(data[b0 * R - lo:min(b1 * R + N, n) - lo], sr,
+                          window=window, config=config)[:b1 - b0]
+    return data, lo, blocks
+
+
+def _extract_streaming(audio_path, gating_features: list[str], features: list[str],
+                       config: dict) -> tuple[int, np.ndarray, np.ndarray, pd.DataFrame]:
+    """Calculates the gating and classification features of a file chunk by chunk.
+
+    The file is read three times: the peak for the normalization, the gating
+    features of all blocks and the classification features of the included blocks.
+    Only the data and blocks of a chunk are held in memory, the results are
+    identical to those of the whole file.
+    """
+    sr, first, last = _analysed_range(audio_path, config)
+    n = last - first
+    N = int(config['USER']["block_size"] * sr)
+    R = int(config['USER']["hop_size"] * sr)
+    dtype = get_signal_dtype(config)
+    window = hann(N).astype(dtype)
+    num_blocks = int(np.ceil((n - N) / R + 1))
+    chunk_blocks = max(int(config["EXECUTION"]["stream_chunk_seconds"] * sr) // R, 1)
+    normalization = config['USER'].get('normalization', 'global')
+    if normalization not in NORMALIZATIONS:
+        raise ValueError(
+            f"Unknown normalization \"{normalization}\", choose one of {NORMALIZATIONS}")
+    peak = stream_peak(str(audio_path), **({"start": first, "stop": last}
+                                          if normalization == "local" else {}))
+
+    gating_values = np.concatenate([
+        calculate_gating_features(
+            _read_blocks(audio_path, first, n, b0, b1, sr, window, peak, config)[2],
+            sr, gating_features, config)
+        for b0, b1 in _stream_chunk_bounds(num_blocks, chunk_blocks)])
+    included_indices = get_included_indices(gating_values, gating_features, config)
+
+    included = np.flatnonzero(included_indices)
+    region_starts = included[np.flatnonzero(np.diff(included) * R > N) + 1]
+    X = np.empty((included.size, len(features)), dtype=dtype)
+    for b0, b1 in _stream_chunk_bounds(num_blocks, chunk_blocks, region_starts):
+        lo, hi = np.searchsorted(included, (b0, b1))
+        if lo == hi:
+            continue
+        data, offset, blocks = _read_blocks(audio_path, first, n, b0, b1, sr, window, peak,
+                                            config, margin=N)
+        X[lo:hi] = _classification_features(data, sr, included[lo:hi] * R - offset,
+                                            blocks[included[lo:hi] - b0], features, config,
+                                            start_sample=offset)
+    return sr, gating_values, included_indices, pd.DataFrame(X, columns=features, index=included)
+
+
+def _extract_cached(audio_path, cache: FeatureCache, gating_features: list[str],
+                    features: list[str], config: dict
+                    ) -> Optional[tuple[int, np.ndarray, np.ndarray, pd.DataFrame]]:
+    """Calculates the gating and classification features of a file using the feature cache.
+
+    The cache holds the features of the complete, windowed blocks of the whole
+    file, i.e. block `j` covers the samples `j * R` to `j * R + N`. The blocks of
+    an analysed part starting at a multiple of `R` are blocks of the file, except
+    the zero-padded last block, which is calculated on every call. The file is
+    only decoded if features of needed blocks are missing in the cache, the peak
+    for the normalization is stored in the entry.
+
+    Returns:
+        None if the cache can't be used (whole-file feature extraction, parts not
+        aligned to the hop size or too short to be framed), else the features.
+    """
+    if config["FEATURE_EXTRACTION"].get("mode", "blockwise") != "blockwise":
+        return None
+    sr, first, last = _analysed_range(audio_path, config)
+    n = last - first
+    N = int(config['USER']["block_size"] * sr)
+    R = int(config['USER']["hop_size"] * sr)
+    if first % R or n < N:
+        return None
+    dtype = get_signal_dtype(config)
+    normalization = config['USER'].get('normalization', 'global')
+    if normalization not in NORMALIZATIONS:
+        raise ValueError(
+            f"Unknown normalization \"{normalization}\", choose one of {NORMALIZATIONS}")
+    peak_range = {"start": first, "stop": last} if normalization == "local" else {}
+    num_blocks = int(np.ceil((n - N) / R + 1))
+    # the blocks of the analysed part except the last one are the blocks j0 ... j0 + m - 1
+    j0, m = first // R, num_blocks - 1
+    grid = slice(j0, j0 + m)
+
+    key = feature_cache_key(content=cache.content_hash(audio_path), sr=sr, N=N, R=R,
+                            window="hann", dtype=dtype.name, peak_range=peak_range, mono=True,
+                            gating_features=gating_features, features=features,
+                            values=config["FEATURE_EXTRACTION"]["VALUES"])
+    entry = cache.load(key)
+    if entry is None:
+        total_blocks = (sf.info(str(audio_path)).frames - N) // R + 1
+        entry = {
+            "peak": np.float64(stream_peak(str(audio_path), **peak_range)),
+            "gating": np.full((total_blocks, len(gating_features)), np.nan, dtype=dtype),
+            "gating_done": np.zeros(total_blocks, dtype=bool),
+            "features": np.full((total_blocks, len(features)), np.nan, dtype=dtype),
+            "features_done": np.zeros(total_blocks, dtype=bool),
+        }
+    peak = float(entry["peak"])
+    modified = False
+    blocks = None
+
+    def _blocks() -> np.ndarray:
+        nonlocal blocks
+        if blocks is None:
+            data, _ = read_wav(audio_path, start=config['USER']['audio_start'],
+                               end=config['USER']['audio_end'], dtype=dtype.name,
+                               normalization=normalization)
+            blocks = frame_signal(data, sr, window=hann(N).astype(dtype), config=config)
+        return blocks
+
+    if not entry["gating_done"][grid].all():
+        entry["gating"][grid] = calculate_gating_features(_blocks()[:m], sr, gating_features,
+                                                          config)
+        entry["gating_done"][grid] = True
+        modified = True
+    if blocks is not None:
+        last_block = blocks[m:]
+    else:
+        last_block = np.zeros((1, N), dtype=dtype)
+        tail = read_frames(audio_path, first + m * R, last, dtype=dtype.name)
+        tail /= peak
+        last_block[0, :tail.size] = tail
+
+    # a copy, the zcr is normalized in place
+    gating_values = np.concatenate(
+        (entry["gating"][grid], calculate_gating_features(last_block, sr, gating_features, config)))
+    included_indices = get_included_indices(gating_values, gating_features, config)
+    included = np.flatnonzero(included_indices)
+    cached = included[included < m]
+
+    missing = cached[~entry["features_done"][j0 + cached]]
+    if missing.size:
+        entry["features"][j0 + missing] = _blockwise_features(_blocks()[missing], sr, features,
+                                                              config)
+        entry["features_done"][j0 + missing] = True
+        modified = True
+    X = np.empty((included.size, len(features)), dtype=dtype)
+    X[:cached.size] = entry["features"][j0 + cached]
+    if cached.size < included.size:
+        X[cached.size:] = _blockwise_features(last_block, sr, features, config)
+    if modified:
+        cache.store(key, entry)
+    return sr, gating_values, included_indices, pd.DataFrame(X, columns=features, index=included)
+
+
+def process_array(data: np.ndarray, sr: int,
+                  gender_model: Optional[str] = None,
+                  settings: Optional[dict] = None,
+                  config: Optional[dict] = None) -> Classification:
+    """Classifies creak in a signal held in memory.
+
+    The part selected by `audio_start` and `audio_end` is normalized like `read_wav`
+    does, so a decoded file gives the same result as `process_file`. Nothing is
+    read from or written to disk, see `write_textgrid` and `write_csv` for the outputs.
+
+    Args:
+        data (np.ndarray): The unnormalized signal of shape (samples,) or (samples, channels),
+            multiple channels are averaged. Objects supporting the buffer protocol (e.g. a
+            `memoryview`) are used without a copy, only the analysed part is copied.
+        sr (int): The sampling rate.
+        gender_model (str, optional): "male", "female" or "all", defaults to the `gender_model` setting.
+        settings (dict, optional): User settings that only apply to this call, see `process_file`.
+        config (dict, optional): The configuration, read from the config files if not given.
+
+    Returns:
+        Classification: The block times, gating mask, features and creak probabilities.
+    """
+    signal = np.asarray(data)
+    if signal.ndim > 1:
+        signal = _to_mono(signal)
+    return Analysis.from_signal(signal, sr, settings, config).classify(gender_model=gender_model)
+
+
+def write_textgrid(result: Classification, textgrid_path: str,
+                   config: Optional[dict] = None) -> str:
+    """Adds the creak intervals of a classification as tier to a TextGrid.
+
+    The result is written next to the TextGrid if the `filename_extension` setting is
+    given, otherwise the TextGrid is overwritten.
+
+    Args:
+        result (Classification): The classification, e.g. of `process_array`.
+        textgrid_path (str): The TextGrid of the audio file.
+        config (dict, optional): The configuration, read from the config files if not given.
+
+    Returns:
+        str: The path of the written TextGrid.
+    """
+    _config = get_config() if config is None else config
+    filename_extension = _config['USER']['filename_extension']
+    if filename_extension:
+        _textgrid_path = Path(textgrid_path)
+        new_filename = _textgrid_path.stem + filename_extension + _textgrid_path.suffix
+        result_path = str(_textgrid_path.parent / new_filename)
+    else:
+        result_path = textgrid_path
+
+    intervals = get_creak_intervals(result.y_pred, result.time, tgt_intervals=True, config=_config)
+    intervals_to_textgrid(
+        intervals=intervals,
+        textgrid_path=textgrid_path,
+        result_path=result_path,
+        tier_name=_config['USER']['tier_name'],
+        verbose=_config['USER']['verbose']
+    )
+    return result_path
+
+
+def write_csv(result: Classification, csv_path: str, config: Optional[dict] = None) -> None:
+    """Writes the creak intervals of a classification to a csv file.
+
+    Args:
+        result (Classification): The classification, e.g. of `process_array`.
+        csv_path (str): The destination, the suffix is replaced by `.csv`.
+        config (dict, optional): The configuration, read from the config files if not given.
+    """
+    _config = get_config() if config is None else config
+    intervals = get_creak_intervals(result.y_pred, result.time, tgt_intervals=True, config=_config)
+    intervals_to_csv(intervals=intervals, csv_dst=csv_path)
 
 
 def process_file(audio_path,
                  textgrid_path: Optional[str] = None,
                  csv_folder_path: Optional[str] = None,
-                 gender_model: Optional[str] = None):
-    _config = get_config()
-    verbosity = _config['USER']['verbose']
-    start, end = _config['USER']['audio_start'], _config['USER']['audio_end']
-    data, sr = read_wav(audio_path, start=start, end=end)
-
-    w = hann(int(_config['USER']["block_size"] * sr))
-    creak_data_buff = buffer(data, sr, window=w)
-    PREPROCESSING_FEATURES = [key for key, val in _config['MODEL']
-                              ['PREPROCESSING']['UNVOICED_EXCLUSION'].items() if val is True]
-    t = time.time()
-    threads = [ThreadWithReturnValue(target=blockwise_feature_calculation, args=[
-                                     creak_data_buff.T.copy(), sr, feature, _config]) for feature in PREPROCESSING_FEATURES]
-    for thread in threads:
-        thread.start()
-    elimination_chunks = np.array([thread.join() for thread in threads]).T
-
-    preprocessing_values = _config["MODEL"]['PREPROCESSING']['UNVOICED_EXCLUSION']["VALUES"]
-    preprocessing_values['ZCR']['threshold'] = _config['USER']['zcr_threshold']
-    preprocessing_values['STE']['threshold'] = _config['USER']['ste_threshold']
-    
-    thresholds = np.array(
-        [thresholding(series=chunk, **preprocessing_values
-                      [feature.upper()]) for chunk, feature in zip(elimination_chunks.T, PREPROCESSING_FEATURES)]
-    )
+                 gender_model: Optional[str] = None,
+                 settings: Optional[dict] = None,
+                 config: Optional[dict] = None):
+    """Classifies creak in an audio file.
 
-    included_indices = thresholds.sum(axis=0) == 0
+    Files longer than two chunks of `EXECUTION.stream_chunk_seconds` are read and
+    analysed chunk by chunk, so memory is bounded by the chunk size instead of the
+    file length. Otherwise the features are read from and added to the feature
+    cache if `FEATURE_CACHE.enabled` is set, so analysing a file again with other
+    thresholds or another gender model skips the feature extraction. Other files
+    are decoded and classified like `process_array`.
 
-    features_for_classification = _config["MODEL"]["FEATURES"]["for_classification"]
+    Args:
+        audio_path (str): Path to the audio file.
+        textgrid_path (str, optional): TextGrid to which the creak intervals are added. Defaults to None.
+        csv_folder_path (str, optional): Destination of a csv file with the creak intervals. Defaults to None.
+        gender_model (str, optional): "male", "female" or "all", defaults to the `gender_model` setting.
+        settings (dict, optional): User settings (e.g. `block_size`, `hop_size`, `creak_threshold`,
+            `zcr_threshold`, `ste_threshold`, `audio_start`, `audio_end`) that only apply to this call.
+            Unlike `set_config` the configuration file is not modified. Defaults to None.
+        config (dict, optional): The configuration, read from the config files if not given.
 
-    t = time.time()
-    threads = [ThreadWithReturnValue(target=blockwise_feature_calculation, args=[
-                                     creak_data_buff.T[included_indices].copy(), sr, feature, _config.copy()]) for feature in features_for_classification]
-    for thread in threads:
-        thread.start()
-    _X_test = np.array([thread.join() for thread in threads]).T
-    # print("time ellapsed:", time.time() - t)
-
-    _X_test = pd.DataFrame(_X_test, columns=features_for_classification,
-                           index=np.argwhere(included_indices).ravel())
-
-    X_test = pd.concat((pd.DataFrame(elimination_chunks,
-                       columns=PREPROCESSING_FEATURES), _X_test), axis=1)
-    y_pred = np.zeros((creak_data_buff.shape[1]))
-    if not any(included_indices):
-        warnings.warn("Did not make classification. Consider setting new values "
-                      "for Zero-Crossing-Rate (zcr) or Short-Term-Energy (ste).")
-        return X_test, y_pred
-
-    # Load model
-    if gender_model is not None:
-        gender_model = gender_model.lower().strip()
-        if gender_model not in ("male", "female", "all"):
-            raise ValueError(
-                f'Gender must be \"male\", \"female\", \"all\" or None is {gender_model}')
+    Returns:
+        tuple[pd.DataFrame, np.ndarray, int]: The features, the creak probability per block and the
+        sampling rate.
+    """
+    _config = apply_settings(settings, config)
+    start = _config['USER']['audio_start']
+    features_for_classification = _config["MODEL"]["FEATURES"]["for_classification"]
+    PREPROCESSING_FEATURES = get_gating_features(_config)
 
+    cache = get_feature_cache(_config)
+    if _use_streaming(audio_path, _config):
+        extracted = _extract_streaming(
+            audio_path, PREPROCESSING_FEATURES, features_for_classification, _config)
+    elif cache is not None:
+        extracted = _extract_cached(
+            audio_path, cache, PREPROCESSING_FEATURES, features_for_classification, _config)
     else:
-        gender_model = _config['USER']['gender_model']
-    model_path = get_root() / _config["MODEL"]["model_location"]
-    model_path = (model_path.parent /
-                  (f"{model_path.stem}_{gender_model.upper()}")).with_suffix(".csv")
-    model = load_model(model_path)
+        extracted = None
 
-    y_pred[included_indices] = model.predict(_X_test)
+    if extracted is None:
+        data, sr = read_wav(audio_path, start=start, end=_config['USER']['audio_end'],
+                            dtype=get_signal_dtype(_config).name,
+                            normalization=_config['USER'].get('normalization', 'global'))
+        result = Analysis(data, sr, config=_config, start_time=start).classify(
+            gender_model=gender_model)
+    else:
+        sr, gating_values, included_indices, X = extracted
+        result = Classification.from_features(sr, gating_values, included_indices, X,
+                                              gender_model, _config, start)
 
     if textgrid_path is not None:
-        tier_name = _config['USER']['tier_name']
-        filename_extension = _config['USER']['filename_extension']
-        
-        if filename_extension:
-            _textgrid_path = Path(textgrid_path)
-            new_filename = _textgrid_path.stem + filename_extension + _textgrid_path.suffix
-            result_path = str(_textgrid_path.parent / new_filename)
-        else:
-            result_path = textgrid_path
-
-        intervals = get_creak_intervals(
-            y_pred, get_time_vector(y_pred, sr, start), tgt_intervals=True)
-        intervals_to_textgrid(
-            intervals=intervals,
-            textgrid_path=textgrid_path,
-            # result_path=textgrid_path if textgrid_dst is None else textgrid_dst,
-            result_path=result_path,
-            tier_name=tier_name,
-            verbose=verbosity
-        )
-
+        write_textgrid(result, textgrid_path, _config)
     if csv_folder_path is not None:
-        intervals = get_creak_intervals(
-            y_pred, get_time_vector(y_pred, sr, start), tgt_intervals=True)
-        intervals_to_csv(
-            intervals=intervals,
-            csv_dst=csv_folder_path
-        )
-        pass
-    return X_test, y_pred, sr
+        write_csv(result, csv_folder_path, _config)
+    return result.X, result.y_pred, result.sr
+
+
+def _audio_seconds(audio_path, config: dict) -> float:
+    """Duration of the analysed part of an audio file in seconds."""
+    duration = sf.info(str(audio_path)).duration
+    start, end = config['USER']['audio_start'], config['USER']['audio_end']
+    if end != -1:
+        duration = min(end, duration)
+    return max(duration - start, 0.0)
+
+
+def _init_folder_worker(gender_model: Optional[str], config: dict) -> None:
+    # every worker process loads the model once, later files use the cached model
+    get_model(gender_model, config)
+
+
+def _process_folder_file(audio_path, textgrid_path, csv_folder_path, config: dict) -> dict:
+    """Classifies a file of a folder, errors are returned instead of raised."""
+    t = time.perf_counter()
+    result = {"audio_path": str(audio_path), "error": None, "audio_seconds": 0.0}
+    try:
+        result["audio_seconds"] = _audio_seconds(audio_path, config)
+        process_file(audio_path, textgrid_path=textgrid_path,
+                     csv_folder_path=csv_folder_path, config=config)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - t
+    return result
 
 
 def process_folder(audio_directory: Optional[str] = None,
                    textgrid_directory: Optional[str] = None,
-                   csv_directory: Optional[str] = None):
-    _config = get_config()
+                   csv_directory: Optional[str] = None,
+                   settings: Optional[dict] = None,
+                   config: Optional[dict] = None,
+                   workers: Optional[int] = None,
+                   max_in_flight: Optional[int] = None) -> list[dict]:
+    """Classifies creak in all audio files of a folder.
+
+    With more than one worker the files are classified by a pool of processes,
+    each of which loads the model once. At most `max_in_flight` files are
+    submitted at a time. A file that can't be classified doesn't stop the
+    others, its error is part of the returned results.
+
+    Args:
+        audio_directory (str, optional): Directory with the audio files, defaults to the
+            `audio_directory` setting.
+        textgrid_directory (str, optional): Directory with the TextGrid files, defaults to
+            the `textgrid_directory` setting.
+        csv_directory (str, optional): Destination of the csv files, defaults to the
+            `csv_directory` setting.
+        settings (dict, optional): User settings that only apply to this call. Defaults to None.
+        config (dict, optional): The configuration, read from the config files if not given.
+        workers (int, optional): Number of worker processes, defaults to `EXECUTION.folder_workers`.
+        max_in_flight (int, optional): Number of files submitted at once, defaults to
+            `EXECUTION.max_in_flight`.
 
+    Returns:
+        list[dict]: Per file the `audio_path`, the `error` (None on success), the analysed
+        `audio_seconds` and the processing time in `seconds`, in the order of the files.
+    """
+    _config = apply_settings(settings, config)
     if audio_directory is None:
         audio_directory = _config['USER']['audio_directory']
     if not os.path.isdir(audio_directory):
@@ -161,10 +482,58 @@ def process_folder(audio_directory: Optional[str] = None,
             wav_tg_map[wav_file] = (
                 textgrid_path / wav_file.stem).with_suffix(textgrid_suffix)
 
-    # for wav_file in track(wav_files, "Processing folder..."):
-    for wav_file in wav_files:
-        process_file(
-            wav_file,
-            textgrid_path=wav_tg_map[wav_file] if textgrid_directory else None,
-            csv_folder_path=csv_directory if csv_directory else None
-        )
+    execution = _config.get("EXECUTION", {})
+    if workers is None:
+        workers = execution.get("folder_workers", 1) or os.cpu_count() or 1
+    if max_in_flight is None:
+        max_in_flight = execution.get("max_in_flight") or 2 * workers
+    if workers > 1:
+        # the files are the unit of parallelism, the blocks of a file are processed serially
+        _config.setdefault("EXECUTION", {})["executor"] = "serial"
+
+    jobs = [(wav_file,
+             wav_tg_map[wav_file] if textgrid_directory else None,
+             Path(csv_directory) / wav_file.stem if csv_directory else None)
+            for wav_file in wav_files]
+    results = [None] * len(jobs)
+    progress = Progress(
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        MofNCompleteColumn(),
+        TextColumn("{task.fields[throughput]:.1f} audio-s/s"),
+        TextColumn("{task.fields[errors]} errors"),
+        TimeElapsedColumn(),
+        disable=not _config['USER']['verbose'])
+    t = time.perf_counter()
+    with progress:
+        task = progress.add_task("Processing folder...", total=len(jobs), throughput=0.0, errors=0)
+        audio_seconds, errors = 0.0, 0
+
+        def _update(index: int, result: dict):
+            nonlocal audio_seconds, errors
+            results[index] = result
+            audio_seconds += result["audio_seconds"]
+            if result["error"] is not None:
+                errors += 1
+                progress.console.print(f"{result['audio_path']}: {result['error']}")
+            progress.update(task, advance=1, errors=errors,
+                            throughput=audio_seconds / (time.perf_counter() - t))
+
+        if workers <= 1:
+            for index, job in enumerate(jobs):
+                _update(index, _process_folder_file(*job, _config))
+            return results
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_folder_worker,
+                                 initargs=(None, _config)) as pool:
+            pending = {}
+            for index, job in enumerate(jobs):
+                pending[pool.submit(_process_folder_file, *job, _config)] = index
+                if len(pending) < max_in_flight:
+                    continue
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    _update(pending.pop(future), future.result())
+            for future in as_completed(pending):
+                _update(pending[future], future.result())
+    return results
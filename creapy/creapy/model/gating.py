@@ -0,0 +1,107 @@
+"""Unvoiced exclusion on the whole block matrix.
+
+Zero-crossing rate and short-term energy only need numpy, so they are
+computed for all blocks at once instead of block by block. The results are
+identical to `_zcr` and `_ste` of the feature extraction.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+
+from ..feature_extraction.feature_extraction import blockwise_feature_calculation
+from ..utils import get_config_snapshot
+from .postprocessing import thresholding
+
+# number of blocks processed at once, bounds the temporary arrays
+_BLOCKS_PER_STEP = 4096
+
+
+def zero_crossing_rate(blocks: np.ndarray) -> np.ndarray:
+    """Zero-crossing rate of each block of a (num_blocks, N) matrix, zeros count as positive."""
+    N = blocks.shape[1]
+    res = np.empty(blocks.shape[0], dtype=blocks.dtype)
+    for i in range(0, blocks.shape[0], _BLOCKS_PER_STEP):
+        positive = blocks[i:i + _BLOCKS_PER_STEP] >= 0
+        res[i:i + _BLOCKS_PER_STEP] = np.count_nonzero(
+            positive[:, 1:] != positive[:, :-1], axis=1) / N
+    return res
+
+
+def short_term_energy(blocks: np.ndarray) -> np.ndarray:
+    """Short-term energy of each block of a (num_blocks, N) matrix."""
+    N = blocks.shape[1]
+    res = np.empty(blocks.shape[0], dtype=blocks.dtype)
+    for i in range(0, blocks.shape[0], _BLOCKS_PER_STEP):
+        res[i:i + _BLOCKS_PER_STEP] = np.sum(blocks[i:i + _BLOCKS_PER_STEP] ** 2, axis=1) / N
+    return res
+
+
+GATING_FEATURES = {
+    "zcr": zero_crossing_rate,
+    "ste": short_term_energy,
+}
+
+
+def get_gating_features(config: Optional[dict] = None) -> list[str]:
+    """Returns the features enabled for the unvoiced exclusion."""
+    if config is None:
+        config = get_config_snapshot()
+    return [key for key, val in config['MODEL']['PREPROCESSING']['UNVOICED_EXCLUSION'].items()
+            if val is True]
+
+
+def calculate_gating_features(blocks: np.ndarray, sr: int,
+                              features: Optional[list[str]] = None,
+                              config: Optional[dict] = None) -> np.ndarray:
+    """Calculates the unvoiced exclusion features of all blocks.
+
+    Args:
+        blocks (np.ndarray): Blocks of shape (num_blocks, N).
+        sr (int): The sampling rate.
+        features (list[str], optional): The features, defaults to the enabled
+            unvoiced exclusion features.
+        config (dict, optional): The configuration. Defaults to None.
+
+    Returns:
+        np.ndarray: Feature values of shape (num_blocks, num_features).
+    """
+    if config is None:
+        config = get_config_snapshot()
+    if features is None:
+        features = get_gating_features(config)
+    res = np.empty((blocks.shape[0], len(features)), dtype=blocks.dtype)
+    for i, feature in enumerate(features):
+        if feature in GATING_FEATURES:
+            res[:, i] = GATING_FEATURES[feature](blocks)
+        else:
+            res[:, i] = blockwise_feature_calculation(blocks, sr, feature, config)
+    return res
+
+
+def get_included_indices(gating_values: np.ndarray, features: list[str],
+                         config: Optional[dict] = None) -> np.ndarray:
+    """Applies the unvoiced exclusion thresholds.
+
+    Features configured with `normalize: true` are normalized in place.
+
+    Args:
+        gating_values (np.ndarray): Feature values of shape (num_blocks, num_features).
+        features (list[str]): The feature names of the columns.
+        config (dict, optional): The configuration. Defaults to None.
+
+    Returns:
+        np.ndarray: Boolean mask of the blocks that are classified.
+    """
+    if config is None:
+        config = get_config_snapshot()
+    preprocessing_values = {feature: dict(values) for feature, values in
+                            config["MODEL"]['PREPROCESSING']['UNVOICED_EXCLUSION']["VALUES"].items()}
+    preprocessing_values['ZCR']['threshold'] = config['USER']['zcr_threshold']
+    preprocessing_values['STE']['threshold'] = config['USER']['ste_threshold']
+
+    excluded = np.zeros(gating_values.shape[0], dtype=bool)
+    for column, feature in zip(gating_values.T, features):
+        excluded |= thresholding(series=column, **preprocessing_values[feature.upper()])
+    return ~excluded
@@ -3,6 +3,7 @@ from __future__ import annotations
 import os
 import pickle
 from pathlib import Path
+from typing import Optional
 
 import numpy as np
 import pandas as pd
@@ -11,6 +12,7 @@ from sklearn.neural_network import MLPClassifier
 from sklearn.impute import SimpleImputer
 
 from ..utils import get_config, get_root
+from .artifact import ARTIFACT_SUFFIX, load_artifact, save_artifact
 from .postprocessing import moving_average
 from .preprocessing import impute
 
@@ -21,8 +23,10 @@ class NotFittedError(Exception):
 class Model:
     """The Model for creaky voice classification.
     """
-    def __init__(self):
-        self._config = get_config()["MODEL"]
+    def __init__(self, config: Optional[dict] = None):
+        if config is None:
+            config = get_config()
+        self._config = config["MODEL"]
         self._X_train: pd.DataFrame
         self._y_train: pd.Series
         self._imputer: SimpleImputer
@@ -51,33 +55,36 @@ class Model:
             self._X_train.loc[:, self._features], self._y_train.ravel())
         self._fitted = True
 
-    def predict(self, X_test: pd.DataFrame, predict_proba: bool=None) -> np.ndarray:
+    def predict(self, X_test: pd.DataFrame, predict_proba: bool=None,
+                config: Optional[dict] = None) -> np.ndarray:
         """Predicts the given features. 
 
         Args:
             X_test (pd.DataFrame): Features to be predicted.
             predict_proba (bool, optional): If `True` the likelihood to be creak will be returned, else the predicted target. 
             Defaults to None.
+            config (dict, optional): The configuration, read from the config files if not given.
+            Defaults to None.
 
         Returns:
             np.ndarray: Predicted targets, or probability of creak.
         """
-        self._config = get_config()["MODEL"]
+        _config = (get_config() if config is None else config)["MODEL"]
         if predict_proba is not None:
             assert isinstance(predict_proba, bool)
         else:
-            predict_proba = self._config["CLASSIFIER"]["predict_proba"]
+            predict_proba = _config["CLASSIFIER"]["predict_proba"]
         if hasattr(self, "_imputer"):
             X_test = pd.DataFrame(self._imputer.transform(
-                X_test.loc[:, self._features]), columns=self._X_train.columns, index=X_test.index)
+                X_test.loc[:, self._features]), columns=self._features, index=X_test.index)
         if predict_proba is True:
             _target_index = np.argwhere(
-                self._clf.classes_ == self._config["CLASSIFIER"]["target_name"]).item()
+                self._clf.classes_ == _config["CLASSIFIER"]["target_name"]).item()
             y_pred = self._clf.predict_proba(X_test[self._features])[
                 :, _target_index].flatten()
-            if self._config["POSTPROCESSING"]["MAVG"]["mavg"] is True:
+            if _config["POSTPROCESSING"]["MAVG"]["mavg"] is True:
                 length, mode = map(
-                    self._config["POSTPROCESSING"]["MAVG"]["VALUES"].get, ("length", "mode"))
+                    _config["POSTPROCESSING"]["MAVG"]["VALUES"].get, ("length", "mode"))
                 y_pred = moving_average(y_pred, length, mode)
         else:
             y_pred = self._clf.predict(X_test[self._features])
@@ -85,7 +92,8 @@ class Model:
         return y_pred
 
     def save(self, filepath: str = None):
-        """Saves a fitted model to the given location as csv file
+        """Saves a fitted model to the given location as csv file and, if configured,
+        as pickle and pre-fitted `.npz` artifact
 
         Args:
             filepath (str, optional): Destination path of saved model. Defaults to None.
@@ -109,32 +117,38 @@ class Model:
         if _config["MODEL"]["save_pickle"] is True:
             with open(filepath.parent / (filepath.name + '.pickle'), "wb") as f:
                 pickle.dump(self, f)
+        if _config["MODEL"]["save_artifact"] is True:
+            save_artifact(self, filepath.parent / (filepath.name + ARTIFACT_SUFFIX))
 
 
-def load_model(filepath: str = None) -> Model:
-    """Loads a already fitted model from a csv file.    
+def load_model(filepath: str = None, config: Optional[dict] = None) -> Model:
+    """Loads a already fitted model from a csv file, a pickle or a `.npz` artifact.
 
     Args:
-        filepath (str, optional): Location of the model csv file. Defaults to None.
+        filepath (str, optional): Location of the model file. Defaults to None.
+        config (dict, optional): The configuration. Defaults to None.
 
     Returns:
         Model: Fitted Model for creak classification.
     """
+    if config is None:
+        config = get_config()
     if filepath is None:
-        filepath = get_root() / get_config()["MODEL"]["model_location"]
+        filepath = get_root() / config["MODEL"]["model_location"]
         filepath = (filepath.parent / (filepath.name)).with_suffix(".csv")
     else:
         filepath = Path(filepath)
 
     if filepath.suffix == ".csv":
-        _config = get_config()
         _X_combined = pd.read_csv(filepath)
-        model = Model()
-        _target_column = _config["MODEL"]["target_label"]
-        _feature_columns = _config["MODEL"]["FEATURES"]["for_classification"]
+        model = Model(config)
+        _target_column = config["MODEL"]["target_label"]
+        _feature_columns = config["MODEL"]["FEATURES"]["for_classification"]
         _X_train, _y_train = _X_combined[_feature_columns], _X_combined[_target_column]
         model.fit(_X_train, _y_train)
         return model
+    if filepath.suffix == ARTIFACT_SUFFIX:
+        return load_artifact(filepath, config)
     if filepath.suffix == ".pickle":
         with open(filepath, "rb") as f:
             return pickle.load(f)
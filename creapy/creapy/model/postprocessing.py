@@ -19,7 +19,7 @@ def thresholding(
     }
     
     # assert y.shape == series.shape
-    if normalize is True: series /= max(series)
+    if normalize is True: series /= np.max(series)
     if y is not None:
         y[_operators[operator](series, threshold)] = replace_value
         return y
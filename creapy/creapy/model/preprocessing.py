@@ -7,14 +7,32 @@ import pandas as pd
 from sklearn.impute import SimpleImputer
 from sklearn.model_selection import train_test_split
 
-from ..utils import get_config
+from ..utils import get_config, get_config_snapshot
+
+SIGNAL_DTYPES = ("float64", "float32")
+
+
+def get_signal_dtype(config: Optional[dict] = None) -> np.dtype:
+    """
+    returns the dtype of the signal, the frames and the feature matrices
+    (`EXECUTION.dtype`), float64 if not configured
+    """
+    if config is None:
+        config = get_config_snapshot()
+    dtype = (config.get("EXECUTION") or {}).get("dtype") or "float64"
+    if dtype not in SIGNAL_DTYPES:
+        raise ValueError(f"Unsupported dtype \"{dtype}\", choose one of {SIGNAL_DTYPES}")
+    return np.dtype(dtype)
 
 
 def impute(X_train: pd.DataFrame,
            X_test: Optional[pd.DataFrame] = None,
-           return_imputer: bool = False):
+           return_imputer: bool = False,
+           config: Optional[dict] = None):
 
-    config_ = get_config()["MODEL"]["PREPROCESSING"]
+    if config is None:
+        config = get_config()
+    config_ = config["MODEL"]["PREPROCESSING"]
     impute_strategy = config_["impute_strategy"]
     _imputer = SimpleImputer(strategy=impute_strategy)
     if X_test is None:
@@ -50,19 +68,26 @@ def split_data(X: pd.DataFrame, y: pd.Series):
     return X_train, X_test, y_train, y_test
 
 
-def buffer(x, sr, opt: str = "nodelay", window=None):
+def frame_signal(x, sr, opt: str = "nodelay", window=None, config: Optional[dict] = None):
     """
-    Buffer signal vector into matrix of data frames
+    Splits a signal into windowed blocks of shape (num_blocks, N)
+
+    Block `j` starts at sample `j * R`. All blocks but the last are read from
+    a `sliding_window_view` of the signal stepped by `R` samples, which
+    shares the memory of `x`, and are multiplied by the window straight into
+    the returned (num_blocks, N) matrix, the only allocation. The last block
+    holds the remaining samples, is zero-padded to N and not windowed.
 
     x: Signal
-    N: block size
-    OL: overlap
     window: predefined window
+    config: configuration, read from the config files if not given
 
     * works only for 1D Signals!
     """
 
-    config_ = get_config()["USER"]
+    if config is None:
+        config = get_config_snapshot()
+    config_ = config["USER"]
     N = int(config_["block_size"] * sr)
     R = int(config_["hop_size"] * sr)
 
@@ -75,17 +100,32 @@ def buffer(x, sr, opt: str = "nodelay", window=None):
     if opt == 'nodelay':
         assert n >= OL, "in 'nodelay' mode, len(x) must be OL or longer"
         n_seg = int(np.ceil((n - N) / R + 1))
-        # print('num_seg:', n_seg)
     else:
         n_seg = int(np.ceil(n / R))
         x = np.concatenate([np.zeros(OL), x.squeeze()])
 
-    res = np.zeros((N, n_seg))
-    for i in range(n_seg - 1):
-        res[:, i] = x[i * R: i * R + N] * window
-
-    i = n_seg - 1
+    res = np.zeros((n_seg, N), dtype=np.result_type(x, window))
+    if n_seg > 1:
+        blocks = np.lib.stride_tricks.sliding_window_view(x[:(n_seg - 2) * R + N], N)[::R]
+        np.multiply(blocks, window, out=res[:-1])
     # last block
-    nLast = x[i * R:].size
-    res[range(nLast), n_seg - 1] = x[i * R:]
+    last = x[(n_seg - 1) * R:]
+    res[-1, :last.size] = last
     return res
+
+
+def buffer(x, sr, opt: str = "nodelay", window=None, config: Optional[dict] = None):
+    """
+    Buffer signal vector into matrix of data frames
+
+    x: Signal
+    N: block size
+    OL: overlap
+    window: predefined window
+    config: configuration, read from the config files if not given
+
+    Returns the transposed (N, num_blocks) view of `frame_signal`.
+
+    * works only for 1D Signals!
+    """
+    return frame_signal(x, sr, opt=opt, window=window, config=config).T
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from threading import Lock
+from typing import Iterable, Optional
+
+from ..utils import get_config, get_root
+from .artifact import ARTIFACT_SUFFIX, artifact_matches_config
+from .model import Model, load_model
+
+GENDER_MODELS = ("all", "male", "female")
+
+
+def get_model_path(gender_model: str = "all", config: Optional[dict] = None) -> Path:
+    """Returns the location of the pre-trained model for the given gender.
+
+    If `MODEL.prefer_artifact` is set and an up-to-date `.npz` artifact of the model
+    exists next to its training csv, the artifact is returned instead.
+
+    Args:
+        gender_model (str, optional): One of "all", "male" or "female". Defaults to "all".
+        config (dict, optional): The configuration. Defaults to None.
+
+    Raises:
+        ValueError: If `gender_model` is not a known gender model.
+
+    Returns:
+        Path: Path to the model artifact or csv file.
+    """
+    if config is None:
+        config = get_config()
+    gender_model = gender_model.lower().strip()
+    if gender_model not in GENDER_MODELS:
+        raise ValueError(
+            f'Gender must be \"male\", \"female\", \"all\" or None is {gender_model}')
+    model_path = get_root() / config["MODEL"]["model_location"]
+    model_path = (model_path.parent /
+                  (f"{model_path.stem}_{gender_model.upper()}")).with_suffix(".csv")
+    artifact_path = model_path.with_suffix(ARTIFACT_SUFFIX)
+    if (config["MODEL"].get("prefer_artifact", False) is True
+            and artifact_path.is_file()
+            and (not model_path.is_file()
+                 or artifact_path.stat().st_mtime_ns >= model_path.stat().st_mtime_ns)
+            and artifact_matches_config(artifact_path, config)):
+        return artifact_path
+    return model_path
+
+
+class ModelRegistry:
+    """Process-wide cache of fitted models.
+
+    Models are keyed by their path, the modification time of the model file and
+    the classifier configuration, so a changed model file or classifier setting
+    results in a refit instead of a stale model.
+    """
+
+    def __init__(self):
+        self._models: dict[tuple, Model] = {}
+        self._locks: dict[tuple, Lock] = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(filepath: Path, config: dict) -> tuple:
+        _model_config = {key: config["MODEL"][key] for key in ("CLASSIFIER", "FEATURES")}
+        return (str(filepath.resolve()), filepath.stat().st_mtime_ns,
+                json.dumps(_model_config, sort_keys=True, default=str))
+
+    def get(self, filepath: str | Path, config: Optional[dict] = None) -> Model:
+        """Returns the fitted model stored at `filepath`, loading it on a cache miss.
+
+        Args:
+            filepath (str | Path): Location of the model file.
+            config (dict, optional): The configuration. Defaults to None.
+
+        Returns:
+            Model: Fitted Model for creak classification.
+        """
+        if config is None:
+            config = get_config()
+        filepath = Path(filepath)
+        key = self._key(filepath, config)
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self.hits += 1
+                return model
+            key_lock = self._locks.setdefault(key, Lock())
+
+        # fitting happens outside the registry lock so other models stay available
+        with key_lock:
+            with self._lock:
+                model = self._models.get(key)
+                if model is not None:
+                    self.hits += 1
+                    return model
+                self.misses += 1
+            model = load_model(filepath, config)
+            with self._lock:
+                # drop models of older versions of the same file
+                for _key in [k for k in self._models if k[0] == key[0]]:
+                    del self._models[_key]
+                    self._locks.pop(_key, None)
+                self._models[key] = model
+        return model
+
+    def get_gender_model(self, gender_model: Optional[str] = None,
+                         config: Optional[dict] = None) -> Model:
+        """Returns the fitted pre-trained model for the given gender.
+
+        Args:
+            gender_model (str, optional): One of "all", "male" or "female". If None,
+                the `gender_model` of the user configuration is used. Defaults to None.
+            config (dict, optional): The configuration. Defaults to None.
+
+        Returns:
+            Model: Fitted Model for creak classification.
+        """
+        if config is None:
+            config = get_config()
+        if gender_model is None:
+            gender_model = config["USER"]["gender_model"]
+        return self.get(get_model_path(gender_model, config), config)
+
+    def preload(self, gender_models: Iterable[str] = GENDER_MODELS,
+                config: Optional[dict] = None) -> None:
+        """Loads the pre-trained models so that the first classification is not slowed down.
+
+        Args:
+            gender_models (Iterable[str], optional): The gender models to load.
+                Defaults to all gender models.
+            config (dict, optional): The configuration. Defaults to None.
+        """
+        for gender_model in gender_models:
+            self.get_gender_model(gender_model, config)
+
+    def invalidate(self, filepath: Optional[str | Path] = None) -> None:
+        """Removes models from the cache.
+
+        Args:
+            filepath (str | Path, optional): Only remove the model stored at this path.
+                If None, all models are removed. Defaults to None.
+        """
+        with self._lock:
+            if filepath is None:
+                self._models.clear()
+                self._locks.clear()
+                return
+            _path = str(Path(filepath).resolve())
+            for key in [k for k in self._models if k[0] == _path]:
+                del self._models[key]
+                self._locks.pop(key, None)
+
+    def info(self) -> dict:
+        """Returns the cache statistics.
+
+        Returns:
+            dict: Number of cache hits, misses and currently cached models.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._models)}
+
+
+model_registry = ModelRegistry()
+
+
+def get_model(gender_model: Optional[str] = None, config: Optional[dict] = None) -> Model:
+    """Returns the fitted pre-trained model for the given gender from the process-wide cache.
+
+    Args:
+        gender_model (str, optional): One of "all", "male" or "female". If None, the
+            `gender_model` of the user configuration is used. Defaults to None.
+        config (dict, optional): The configuration. Defaults to None.
+
+    Returns:
+        Model: Fitted Model for creak classification.
+    """
+    return model_registry.get_gender_model(gender_model, config)
+
+
+def preload_models(gender_models: Iterable[str] = GENDER_MODELS,
+                   config: Optional[dict] = None) -> None:
+    model_registry.preload(gender_models, config)
+
+
+def invalidate_models(filepath: Optional[str | Path] = None) -> None:
+    model_registry.invalidate(filepath)
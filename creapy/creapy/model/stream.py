@@ -0,0 +1,152 @@
+"""Classification of a signal that arrives in chunks, e.g. from a microphone.
+
+A `StreamAnalysis` frames the samples as they arrive like `frame_signal` frames a
+whole signal: a block is windowed and classified as soon as the sample after it
+arrived, the last (zero-padded, not windowed) block when the stream is flushed.
+
+`process_file` normalizes the signal by its peak and the zero-crossing rate by its
+maximum, both of the whole signal. A stream uses the maxima of the samples and
+blocks received so far instead, or a peak given in advance.
+"""
+from __future__ import annotations
+
+from copy import deepcopy
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+from scipy.signal.windows import hann
+
+from ..feature_extraction.feature_extraction import calculate_block_features
+from ..utils.config import apply_settings
+from ..utils.helpers import CreakIntervalDetector
+from .gating import calculate_gating_features, get_gating_features, get_included_indices
+from .preprocessing import get_signal_dtype
+from .registry import get_model
+
+
+class StreamUpdate(NamedTuple):
+    """The blocks classified by a `StreamAnalysis.push` or `flush`.
+
+    Attributes:
+        first_block (int): Index of the first block of the update in the stream.
+        time (np.ndarray): The center time of each block in seconds.
+        y_pred (np.ndarray): The creak probability of each block.
+        included (np.ndarray): Whether each block was included by the gating.
+        intervals (np.ndarray): The creak intervals closed by the update as array of
+            shape (num_intervals, 2) of start and end times.
+    """
+    first_block: int
+    time: np.ndarray
+    y_pred: np.ndarray
+    included: np.ndarray
+    intervals: np.ndarray
+
+
+class StreamAnalysis:
+    """Incremental framing, gating and classification of a mono signal.
+
+    Args:
+        sr (int): The sampling rate.
+        settings (dict, optional): User settings, see `process_file`. Defaults to None.
+        config (dict, optional): The configuration, read from the config files if not given.
+        peak (float, optional): The normalization peak of the signal, e.g. 1 for full scale
+            samples. Defaults to the running peak of the samples received so far.
+        start_time (float, optional): Time of the first sample in seconds. Defaults to 0.
+    """
+
+    def __init__(self, sr: int, settings: Optional[dict] = None, config: Optional[dict] = None,
+                 peak: Optional[float] = None, start_time: float = 0.0):
+        self.config = apply_settings(settings, config)
+        self.sr = sr
+        self.start_time = start_time
+        self.dtype = get_signal_dtype(self.config)
+        self.N = int(self.config['USER']["block_size"] * sr)
+        self.R = int(self.config['USER']["hop_size"] * sr)
+        self.window = hann(self.N).astype(self.dtype)
+        self.gating_features = get_gating_features(self.config)
+        self.features = list(self.config["MODEL"]["FEATURES"]["for_classification"])
+        self.model = get_model(None, self.config)
+
+        self.peak = peak
+        self._running_peak = 0.0
+        # features normalized by their maximum are normalized by the running maximum
+        values = self.config["MODEL"]['PREPROCESSING']['UNVOICED_EXCLUSION']["VALUES"]
+        self._normalized = [i for i, feature in enumerate(self.gating_features)
+                            if values[feature.upper()].get("normalize", False)]
+        self._maxima = np.zeros(len(self.gating_features))
+        self._gating_config = deepcopy(self.config)
+        for value in self._gating_config["MODEL"]['PREPROCESSING']['UNVOICED_EXCLUSION']["VALUES"].values():
+            value["normalize"] = False
+
+        # samples from the start of the next block on
+        self._buffer = np.empty(0, dtype=self.dtype)
+        self.num_samples = 0
+        self.num_blocks = 0
+        self.finished = False
+        self.intervals = CreakIntervalDetector(config=self.config)
+
+    def block_times(self, blocks: np.ndarray) -> np.ndarray:
+        """The center times of the blocks with the given indices, see `get_time_vector`."""
+        return (self.config['USER']["block_size"] / 2 + self.start_time
+                + np.asarray(blocks) * self.config['USER']["hop_size"])
+
+    def push(self, samples: np.ndarray) -> StreamUpdate:
+        """Adds samples to the stream and classifies the blocks they complete."""
+        if self.finished:
+            raise ValueError("The stream was flushed already")
+        samples = np.asarray(samples, dtype=self.dtype).ravel()
+        if samples.size:
+            self._running_peak = max(self._running_peak, float(np.max(np.abs(samples))))
+        self._buffer = np.concatenate((self._buffer, samples))
+        self.num_samples += samples.size
+        # a block is complete once a sample after it arrived, as in `frame_signal`
+        count = max(int(np.ceil((self._buffer.size - self.N) / self.R)), 0)
+        if count == 0:
+            return self._classify(np.empty((0, self.N), dtype=self.dtype))
+        peak = self._normalization_peak()
+        segments = np.lib.stride_tricks.sliding_window_view(
+            self._buffer[:(count - 1) * self.R + self.N], self.N)[::self.R]
+        blocks = (segments / peak) * self.window
+        self._buffer = self._buffer[count * self.R:]
+        return self._classify(blocks)
+
+    def flush(self) -> StreamUpdate:
+        """Classifies the last block and closes all remaining creak intervals."""
+        if self.finished:
+            raise ValueError("The stream was flushed already")
+        self.finished = True
+        # number of blocks of `frame_signal` for the whole stream
+        num_blocks = int(np.ceil((self.num_samples - self.N) / self.R + 1))
+        blocks = np.zeros((max(num_blocks - self.num_blocks, 0), self.N), dtype=self.dtype)
+        if blocks.size:
+            # the last block is zero-padded and not windowed
+            blocks[0, :self._buffer.size] = self._buffer / self._normalization_peak()
+        self._buffer = self._buffer[:0]
+        return self._classify(blocks)
+
+    def _normalization_peak(self) -> float:
+        peak = self._running_peak if self.peak is None else self.peak
+        return peak if peak > 0 else 1.0
+
+    def _classify(self, blocks: np.ndarray) -> StreamUpdate:
+        gating_values = calculate_gating_features(blocks, self.sr, self.gating_features, self.config)
+        if len(blocks):
+            for i in self._normalized:
+                self._maxima[i] = max(self._maxima[i], gating_values[:, i].max())
+                if self._maxima[i] > 0:
+                    gating_values[:, i] /= self._maxima[i]
+        included = get_included_indices(gating_values, self.gating_features, self._gating_config)
+        y_pred = np.zeros(len(blocks), dtype=self.dtype)
+        if included.any():
+            X = pd.DataFrame(calculate_block_features(blocks[included], self.sr, self.features, self.config),
+                             columns=self.features, index=np.flatnonzero(included) + self.num_blocks)
+            y_pred[included] = self.model.predict(X, config=self.config)
+
+        first = self.num_blocks
+        self.num_blocks += len(blocks)
+        segments = self.intervals.push(y_pred)
+        if self.finished:
+            segments = np.concatenate((segments, self.intervals.flush()))
+        return StreamUpdate(first, self.block_times(np.arange(first, self.num_blocks)), y_pred, included,
+                            self.block_times(segments).reshape(-1, 2))
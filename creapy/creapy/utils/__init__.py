@@ -1,6 +1,8 @@
 from .text_grid_to_intervals import read_textgrid, generate_sample_wavs
-from .config import get_config, get_user_config, set_config, reset_config, CONFIG_DIR
-from .read_wav import read_wav
+from .config import get_config, get_config_snapshot, invalidate_config, apply_settings, get_user_config, set_config, reset_config, CONFIG_DIR
+from .read_wav import read_wav, read_frames, stream_peak, NORMALIZATIONS
+from .feature_cache import FeatureCache, get_feature_cache, feature_cache_key, content_hash
+from .executor import map_frames, chunk_bounds, get_execution_settings, shutdown_pools, ChunkTiming, EXECUTORS
 from .helpers import *
-from .evaluation import evaluation_metrics, evaluate
+from .evaluation import evaluation_metrics, evaluate, compare_extraction_modes
 from .plot import plot
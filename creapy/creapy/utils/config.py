@@ -1,9 +1,15 @@
 from __future__ import annotations
 
+import os
+import time
+from copy import deepcopy
 import yaml
 import ruamel.yaml
 from os.path import isfile
 from pathlib import Path
+from threading import Lock
+from types import MappingProxyType
+from typing import Mapping, Optional
 import sys
 _RELATIVE_PATH_TO_CONFIG = "../config.yaml"
 _RELATIVE_PATH_TO_USER_CONFIG = "../user_config.yaml"
@@ -20,6 +26,7 @@ textgrid_directory: null # Path to the directory containing the respective textg
 csv_directory: null # Path to a folder where the csv-files containing the classification results should be stored
 audio_start: 0 # starttime in seconds where the audiofile should be analysed
 audio_end: -1 # endtime in seconds until the audiofile should be analysed
+normalization: global # normalize the audio by the peak of the whole file (global) or of the analysed part (local)
 audio_suffix: .wav # suffix of the audio-file(s)
 filename_extension: null # string to append to the original textgrid filename. Creates a new file with the corresponding name.
 textgrid_suffix: .TextGrid # suffix of the textgrid-file(s)
@@ -34,14 +41,43 @@ ste_threshold: 1.0e-05 # Threshold for the short-term-energy crossing rate pre-e
 """
 
 
-def get_config() -> dict:
-    """
-    returns the configuration file as a dictionary
+# state of the config files and the frozen configuration
+_config_snapshot: Optional[tuple[tuple, Mapping]] = None
+_config_lock = Lock()
+# the config files are checked for changes at most this often (seconds)
+_CONFIG_CHECK_INTERVAL = 1.0
+_config_checked = 0.0
 
-    Returns:
-        dict: the configuration
-    """
 
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(val) for key, val in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(val) for val in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, Mapping):
+        return {key: _thaw(val) for key, val in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(val) for val in value]
+    return value
+
+
+def _config_sources_state() -> tuple:
+    state = []
+    for path in (_CONFIG_DIR, _USER_CONFIG_DIR, USER_CONFIG_DIR):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            state.append(None)
+        else:
+            state.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(state)
+
+
+def _read_config() -> dict:
     with open(_CONFIG_DIR) as config_file:
         config: dict = ruamel.yaml.safe_load(config_file.read())
 
@@ -64,12 +100,87 @@ def get_config() -> dict:
     return config
 
 
+def get_config_snapshot() -> Mapping:
+    """
+    returns the parsed configuration as an immutable mapping. The configuration
+    files are only parsed again if one of them changed on disk, they are checked
+    for changes at most once a second.
+
+    Returns:
+        Mapping: the read-only configuration
+    """
+    return _get_cached_config()[1]
+
+
+def _get_cached_config() -> tuple[tuple, Mapping]:
+    global _config_snapshot, _config_checked
+    snapshot = _config_snapshot
+    now = time.monotonic()
+    if snapshot is not None and now - _config_checked < _CONFIG_CHECK_INTERVAL:
+        return snapshot
+    state = _config_sources_state()
+    if snapshot is not None and snapshot[0] == state:
+        _config_checked = now
+        return snapshot
+    with _config_lock:
+        if _config_snapshot is None or _config_snapshot[0] != state:
+            _config_snapshot = state, _freeze(_read_config())
+        _config_checked = now
+        return _config_snapshot
+
+
+def get_config() -> dict:
+    """
+    returns the configuration file as a dictionary. Every call returns a new copy
+    of the cached configuration, use `get_config_snapshot` to only read it
+
+    Returns:
+        dict: the configuration
+    """
+    return _thaw(get_config_snapshot())
+
+
+def invalidate_config() -> None:
+    """forces the configuration files to be parsed again on the next call of `get_config_snapshot`"""
+    global _config_snapshot
+    with _config_lock:
+        _config_snapshot = None
+
+
+def apply_settings(settings: Optional[dict] = None, config: Optional[dict] = None) -> dict:
+    """
+    returns a copy of the configuration where the user configuration is updated
+    with the given settings. In contrast to `set_config` the configuration files
+    are not touched, so the settings only apply to the calls the returned
+    configuration is passed to.
+
+    Args:
+        settings (dict, optional): user settings, e.g. `block_size` or `creak_threshold`
+        config (dict, optional): the configuration to update, read from the config files if not given
+
+    Raises:
+        ValueError: if a setting is not part of the user configuration
+
+    Returns:
+        dict: the updated configuration
+    """
+    config = _thaw(get_config_snapshot()) if config is None else deepcopy(config)
+    if not settings:
+        return config
+    for key in settings.keys():
+        if key not in config['USER']:
+            raise ValueError(
+                f"key \"{key}\" can't be set in config, possible keys: {list(config['USER'].keys())}")
+    config['USER'].update(settings)
+    return config
+
+
 def get_user_config() -> dict:
-    return get_config()['USER']
+    return dict(get_config_snapshot()['USER'])
 
 
 def set_config(**kwargs) -> None:
-    _default_config: dict = get_config()['USER']
+    _default_config: dict = dict(get_config_snapshot()['USER'])
     for key in kwargs.keys():
         if key not in _default_config:
             raise ValueError(
@@ -82,6 +193,7 @@ def set_config(**kwargs) -> None:
     USER_CONFIG_DIR.parent.mkdir(parents=True, exist_ok=True)
     with open(USER_CONFIG_DIR, "w") as user_config_file:
         ruamel_yaml.dump(code, user_config_file)
+    invalidate_config()
 
 
 def reset_config() -> None:
@@ -226,6 +226,53 @@ def evaluate(textgrid, tier_name_true, tier_name_creapy, boundary_tier_name=None
     return F1, Precision, Recall, TP, FP, FN
 
 
+def compare_extraction_modes(audio_path, settings: dict | None = None,
+                             config: dict | None = None):
+    """Compares the whole-file feature extraction with the blockwise one.
+
+    Both modes classify the same blocks, so the features can be compared block by
+    block. Returns a DataFrame with one row per feature and one for the creak
+    probability, containing the number of blocks where both values are defined,
+    the Pearson correlation, the mean absolute difference, the mean absolute value
+    of the blockwise reference and the share of blocks where only one mode yields
+    a value. For the creak probability, `decision_agreement` is the share of blocks
+    with the same decision at the creak threshold.
+    """
+    import pandas as pd
+    from ..model.classify import process_file
+    from .config import apply_settings
+
+    config = apply_settings(settings, config)
+    results = {}
+    for mode in ("blockwise", "whole_file"):
+        _config = apply_settings(None, config)
+        _config["FEATURE_EXTRACTION"]["mode"] = mode
+        results[mode] = process_file(audio_path, config=_config)[:2]
+
+    (X_ref, y_ref), (X_track, y_track) = results["blockwise"], results["whole_file"]
+    rows = {}
+    for feature in config["MODEL"]["FEATURES"]["for_classification"]:
+        ref, track = X_ref[feature].to_numpy(), X_track[feature].to_numpy()
+        classified = ~(np.isnan(ref) & np.isnan(track))
+        both = ~np.isnan(ref) & ~np.isnan(track)
+        rows[feature] = {
+            "blocks": int(both.sum()),
+            "correlation": np.corrcoef(ref[both], track[both])[0, 1] if both.sum() > 1 else np.nan,
+            "mean_abs_difference": np.abs(ref[both] - track[both]).mean() if both.any() else np.nan,
+            "mean_abs_reference": np.abs(ref[both]).mean() if both.any() else np.nan,
+            "definedness_mismatch": (classified & ~both).sum() / max(classified.sum(), 1),
+        }
+    threshold = config["USER"]["creak_threshold"]
+    rows["creak_probability"] = {
+        "blocks": len(y_ref),
+        "correlation": np.corrcoef(y_ref, y_track)[0, 1],
+        "mean_abs_difference": np.abs(y_ref - y_track).mean(),
+        "mean_abs_reference": np.abs(y_ref).mean(),
+        "decision_agreement": ((y_ref >= threshold) == (y_track >= threshold)).mean(),
+    }
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
 def main():
     TEXTGRID_PATH = "/home/creaker/tip/stateofgrass/GRASS/004M024F/004M024F_HM2_HM1_CS_001_creak.TextGrid"
     OWN_TIER_NAME = "024F-creak"
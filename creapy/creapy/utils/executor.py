@@ -0,0 +1,159 @@
+"""Chunked execution of blockwise computations.
+
+A frame matrix of shape (num_blocks, N) is split into chunks of consecutive
+blocks that are processed by one of the executors
+
+- serial: in the calling thread
+- threads: by a pool of threads sharing the frame matrix
+- processes: by a pool of processes, the frame matrix is copied once into
+  shared memory from which every worker reads its chunk, so no frames are pickled
+
+The results of the chunks are concatenated in frame order.
+"""
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from threading import Lock, current_thread
+from typing import Callable, NamedTuple, Optional
+
+import numpy as np
+
+from .config import get_config_snapshot
+
+EXECUTORS = ("serial", "threads", "processes")
+
+
+class ChunkTiming(NamedTuple):
+    start: int
+    stop: int
+    seconds: float
+    worker: str
+
+
+def get_execution_settings(config: Optional[dict] = None) -> tuple[str, int, Optional[int]]:
+    """Returns the executor, the number of workers and the chunk size of the configuration.
+
+    Raises:
+        ValueError: If the configured executor is unknown.
+    """
+    if config is None:
+        config = get_config_snapshot()
+    execution = config.get("EXECUTION") or {}
+    executor = execution.get("executor") or "threads"
+    if executor not in EXECUTORS:
+        raise ValueError(f"Unknown executor \"{executor}\", choose one of {EXECUTORS}")
+    workers = execution.get("workers") or os.cpu_count() or 1
+    return executor, int(workers), execution.get("chunk_size")
+
+
+def chunk_bounds(num_blocks: int, workers: int,
+                 chunk_size: Optional[int] = None) -> list[tuple[int, int]]:
+    """Splits `num_blocks` blocks into consecutive chunks.
+
+    Without a `chunk_size` the blocks are split evenly into one chunk per worker.
+    """
+    if num_blocks == 0:
+        return []
+    if not chunk_size:
+        chunk_size = -(-num_blocks // max(workers, 1))
+    return [(start, min(start + chunk_size, num_blocks))
+            for start in range(0, num_blocks, chunk_size)]
+
+
+_pools: dict[tuple[str, int], Executor] = {}
+_pools_lock = Lock()
+
+
+def _get_pool(executor: str, workers: int) -> Executor:
+    """Returns a pool of the process, pools are kept alive so workers start only once."""
+    with _pools_lock:
+        pool = _pools.get((executor, workers))
+        if pool is None:
+            pool_cls = ThreadPoolExecutor if executor == "threads" else ProcessPoolExecutor
+            pool = _pools[(executor, workers)] = pool_cls(max_workers=workers)
+        return pool
+
+
+def shutdown_pools() -> None:
+    """Shuts down the thread and process pools of the executors."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown()
+        _pools.clear()
+
+
+def _run_chunk(func: Callable, frames: np.ndarray, start: int, stop: int, args: tuple):
+    t = time.perf_counter()
+    result = func(frames[start:stop], *args)
+    return result, ChunkTiming(start, stop, time.perf_counter() - t,
+                               f"{os.getpid()}/{current_thread().name}")
+
+
+def _run_shared_chunk(func: Callable, name: str, shape: tuple, dtype: str,
+                      start: int, stop: int, args: tuple):
+    shm = SharedMemory(name=name)
+    try:
+        frames = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        result, timing = _run_chunk(func, frames, start, stop, args)
+        del frames
+        return result, timing
+    finally:
+        shm.close()
+
+
+def map_frames(func: Callable[..., np.ndarray], frames: np.ndarray, args: tuple = (),
+               config: Optional[dict] = None, executor: Optional[str] = None,
+               workers: Optional[int] = None, chunk_size: Optional[int] = None
+               ) -> tuple[np.ndarray, list[ChunkTiming]]:
+    """Applies `func(chunk, *args)` to chunks of a frame matrix.
+
+    `func` has to return an array with one row per block of the chunk. With the
+    process executor `func` and `args` have to be picklable.
+
+    Args:
+        func (Callable): The blockwise computation, e.g. `calculate_block_features`.
+        frames (np.ndarray): The frames of shape (num_blocks, N).
+        args (tuple, optional): Further positional arguments of `func`.
+        config (dict, optional): The configuration providing the `EXECUTION` defaults.
+        executor (str, optional): "serial", "threads" or "processes".
+        workers (int, optional): The number of workers.
+        chunk_size (int, optional): The number of blocks per chunk.
+
+    Returns:
+        tuple[np.ndarray, list[ChunkTiming]]: The concatenated results in frame
+        order and the timing of every chunk.
+    """
+    _executor, _workers, _chunk_size = get_execution_settings(config)
+    executor = executor or _executor
+    workers = workers or _workers
+    chunk_size = chunk_size or _chunk_size
+    if executor not in EXECUTORS:
+        raise ValueError(f"Unknown executor \"{executor}\", choose one of {EXECUTORS}")
+    bounds = chunk_bounds(frames.shape[0], workers, chunk_size)
+    if not bounds:
+        return func(frames, *args), []
+
+    if executor == "serial" or (workers == 1 and executor == "threads") or len(bounds) == 1:
+        outputs = [_run_chunk(func, frames, start, stop, args) for start, stop in bounds]
+    elif executor == "threads":
+        pool = _get_pool(executor, workers)
+        outputs = list(pool.map(lambda bound: _run_chunk(func, frames, *bound, args), bounds))
+    else:
+        pool = _get_pool(executor, workers)
+        shm = SharedMemory(create=True, size=max(frames.nbytes, 1))
+        try:
+            shared = np.ndarray(frames.shape, dtype=frames.dtype, buffer=shm.buf)
+            shared[:] = frames
+            del shared
+            futures = [pool.submit(_run_shared_chunk, func, shm.name, frames.shape,
+                                   frames.dtype.str, start, stop, args)
+                       for start, stop in bounds]
+            outputs = [future.result() for future in futures]
+        finally:
+            shm.close()
+            shm.unlink()
+    results, timings = zip(*outputs)
+    return np.concatenate(results), list(timings)
@@ -0,0 +1,182 @@
+"""Content-addressed on-disk cache of per-block features.
+
+An entry holds the gating and classification features of all complete blocks
+of an audio file, computed for a sampling rate, block and hop size, window,
+dtype, normalization and feature set, and the normalization peak. The entry
+name is the hash of these parameters and of the file content, so a changed file
+or setting never hits a stale entry. Features of blocks that weren't needed yet
+(e.g. excluded by the gating) are missing and added to the entry when a later
+analysis computes them.
+
+Entries are uncompressed `.npz` files. The content hashes of the files are
+stored as well, under their path, size and modification time, so an unchanged
+file is not read again to find its entries. When the cache exceeds its size,
+the least recently used entries are removed.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+
+import numpy as np
+
+from .config import USER_CONFIG_DIR, get_config_snapshot
+
+ENTRY_SUFFIX = ".npz"
+HASH_SUFFIX = ".sha256"
+
+
+@lru_cache(maxsize=256)
+def _cached_content_hash(path: str, mtime_ns: int, size: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_hash(path: str | Path) -> str:
+    """Returns the sha256 hash of a file's content, cached until the file changes."""
+    stat = os.stat(path)
+    return _cached_content_hash(os.fspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def feature_cache_key(**parts) -> str:
+    """Returns the entry name of the given key parts (json serializable values)."""
+    return hashlib.sha256(
+        json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class FeatureCache:
+    """Directory of feature cache entries with size based LRU eviction.
+
+    Loading an entry updates its modification time, which is used as the time
+    of last use.
+    """
+
+    def __init__(self, directory: str | Path, max_size: int):
+        self.directory = Path(directory)
+        self.max_size = int(max_size)
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{ENTRY_SUFFIX}"
+
+    def _write(self, path: Path, write) -> None:
+        """Calls `write` with a binary file that replaces `path` once it is written."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # written to a temporary file first, so readers never see partial files
+        fd, tmp_path = tempfile.mkstemp(suffix=path.suffix, dir=self.directory, prefix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def content_hash(self, path: str | Path) -> str:
+        """Returns the hash of a file's content, which is only calculated if the file
+        is new or changed since its hash was stored."""
+        stat = os.stat(path)
+        name = feature_cache_key(path=os.path.abspath(path), size=stat.st_size,
+                                 mtime_ns=stat.st_mtime_ns)
+        hash_path = self.directory / f"{name}{HASH_SUFFIX}"
+        try:
+            content = hash_path.read_text()
+            os.utime(hash_path)
+        except OSError:
+            content = ""
+        if len(content) != hashlib.sha256().digest_size * 2:
+            content = content_hash(path)
+            self._write(hash_path, lambda f: f.write(content.encode()))
+        return content
+
+    def load(self, key: str) -> Optional[dict[str, np.ndarray]]:
+        """Returns the arrays of an entry or None if the entry doesn't exist."""
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as archive:
+                arrays = {name: archive[name] for name in archive.files}
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return arrays
+
+    def store(self, key: str, arrays: dict[str, np.ndarray]) -> None:
+        """Writes an entry and evicts the least recently used entries if the cache is too large."""
+        self._write(self._path(key), lambda f: np.savez(f, **arrays))
+        self.evict()
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for path in self.directory.glob("*"):
+            if path.suffix not in (ENTRY_SUFFIX, HASH_SUFFIX) or path.name.startswith(".tmp"):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self) -> None:
+        """Removes the least recently used entries until the cache fits into `max_size` bytes."""
+        with self._lock:
+            entries = sorted(self._entries())
+            size = sum(entry[1] for entry in entries)
+            for _, entry_size, path in entries:
+                if size <= self.max_size:
+                    break
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                size -= entry_size
+
+    def clear(self) -> None:
+        """Removes all entries."""
+        with self._lock:
+            for _, _, path in self._entries():
+                path.unlink(missing_ok=True)
+
+    def info(self) -> dict:
+        """Returns the number of hits, misses, entries and the size of the cache in bytes."""
+        entries = self._entries() if self.directory.is_dir() else []
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "entries": sum(entry[2].suffix == ENTRY_SUFFIX for entry in entries),
+                    "size": sum(entry[1] for entry in entries)}
+
+
+_caches: dict[tuple[str, int], FeatureCache] = {}
+_caches_lock = Lock()
+
+
+def get_feature_cache(config: Optional[dict] = None) -> Optional[FeatureCache]:
+    """Returns the feature cache of the configuration (`FEATURE_CACHE`), None if it is disabled."""
+    if config is None:
+        config = get_config_snapshot()
+    cache_config = config.get("FEATURE_CACHE") or {}
+    if cache_config.get("enabled", False) is not True:
+        return None
+    directory = cache_config.get("directory") or USER_CONFIG_DIR.parent / "feature_cache"
+    directory = str(Path(directory).expanduser())
+    max_size = int(cache_config.get("max_size_mb", 1024) * 1024 ** 2)
+    with _caches_lock:
+        cache = _caches.get((directory, max_size))
+        if cache is None:
+            cache = _caches[(directory, max_size)] = FeatureCache(directory, max_size)
+        return cache
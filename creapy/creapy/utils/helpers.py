@@ -6,101 +6,152 @@ from typing import Optional, Union
 import numpy as np
 import tgt
 
-from ..utils import get_config
-from threading import Thread
+from ..utils import get_config_snapshot
 
 
-def get_creak_intervals(series: np.ndarray, dt: np.ndarray, threshold: Optional[float] = None,
-                        tgt_intervals=False):
-    # _config = get_config()["MODEL"]["POSTPROCESSING"]["INTERVALS"]
-    _config = get_config()
+def _interval_blocks(config: dict) -> tuple[int, int]:
+    """The minimum creak length and the maximum gap of creak intervals in blocks."""
+    t_hop = config['USER']["hop_size"]
+    # minimum creak length and maximum gap in seconds
+    T_MIN = config["MODEL"]["POSTPROCESSING"]["INTERVALS"]["min_creak_length"]
+    T_GAP = config["MODEL"]["POSTPROCESSING"]["INTERVALS"]["max_gap"]
+    return round(T_MIN / t_hop) + 1, round(T_GAP / t_hop) - 1
+
+
+def get_creak_segments(series: np.ndarray, threshold: Optional[float] = None,
+                       config: Optional[dict] = None) -> np.ndarray:
+    """Returns the blocks of the creak intervals of a creak probability series.
+
+    Blocks with a probability of at least `threshold` are creak. Runs of creak
+    blocks separated by at most `max_gap` are merged, merged runs shorter than
+    `min_creak_length` and runs that last until the end of the series are dropped.
+
+    Args:
+        series (np.ndarray): The creak probability of each block.
+        threshold (float, optional): The creak threshold, defaults to the
+            `creak_threshold` setting.
+        config (dict, optional): The configuration. Defaults to None.
+
+    Returns:
+        np.ndarray: Array of shape (num_intervals, 2) with the index of the first
+        and the last block of each interval.
+    """
+    _config = get_config_snapshot() if config is None else config
     if threshold is None:
         threshold = _config['USER']["creak_threshold"]
-
-    t_hop = _config['USER']["hop_size"]
-    # minimum creak length in seconds
-    T_MIN = _config["MODEL"]["POSTPROCESSING"]["INTERVALS"]["min_creak_length"]
-    T_GAP = _config["MODEL"]["POSTPROCESSING"]["INTERVALS"]["max_gap"]
-    # T_BLOCK = get_config()["MODEL"]["PREPROCESSING"]["block_size"]
-    # minimum creak length in blocks # TODO floor division?
-    N_MIN = round(T_MIN / t_hop) + 1
-    N_GAP = round(T_GAP / t_hop) - 1
-    # print(N_MIN, N_GAP)
-    i = 0
-    creak_bin = np.where(series >= threshold, 1, 0).astype(int)
-    res = np.zeros(creak_bin.shape).astype(int)
-    n_segment = 0
-    n_gap = np.arange(1, N_GAP+1)  # arange is important here
-    creak_bin = np.append(creak_bin, np.zeros(N_GAP))
-    idx0: int
-    for idx, c in enumerate(creak_bin[:-N_GAP]):
-        if c == 0 and not n_segment:
-            continue
-        elif c == 1 and not n_segment:
-            idx0 = idx
-            n_segment += 1
-        elif c == 1 and n_segment:
-            n_segment += 1
-        elif c == 0 and n_segment:
-            # TODO idxerror
-            if any(creak_bin[idx + n_gap]):
-                n_segment += 1
+    N_MIN, N_GAP = _interval_blocks(_config)
+
+    creak = np.asarray(series) >= threshold
+    if N_GAP <= 0 or not creak.any():
+        return np.empty((0, 2), dtype=np.intp)
+    # runs of creak blocks, `ends` are exclusive
+    edges = np.diff(np.concatenate(([0], creak.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    # gaps of up to N_GAP blocks are bridged
+    first_of_group = np.concatenate(([True], starts[1:] - ends[:-1] > N_GAP))
+    last_of_group = np.concatenate((first_of_group[1:], [True]))
+    starts, ends = starts[first_of_group], ends[last_of_group]
+    keep = (ends - starts >= N_MIN) & (ends < creak.size)
+    return np.column_stack((starts[keep], ends[keep] - 1))
+
+
+class CreakIntervalDetector:
+    """Online version of `get_creak_segments` for a series that arrives in batches.
+
+    An interval is returned as soon as it is final, i.e. more than `max_gap` blocks
+    without creak follow it, the interval that is still open when the series ends is
+    returned by `flush`. Together the returned intervals are the same as those of
+    `get_creak_segments` for the whole series. Only the open interval is kept.
+
+    Args:
+        threshold (float, optional): The creak threshold, defaults to the
+            `creak_threshold` setting.
+        config (dict, optional): The configuration. Defaults to None.
+    """
+
+    def __init__(self, threshold: Optional[float] = None, config: Optional[dict] = None):
+        _config = get_config_snapshot() if config is None else config
+        self.threshold = _config['USER']["creak_threshold"] if threshold is None else threshold
+        self.N_MIN, self.N_GAP = _interval_blocks(_config)
+        # number of blocks so far
+        self.position = 0
+        # first block and exclusive end of the open interval, i.e. of its last run
+        self._start = None
+        self._end = None
+
+    def push(self, series: np.ndarray) -> np.ndarray:
+        """Adds the next blocks of the series and returns the intervals they finalize.
+
+        Returns:
+            np.ndarray: Array of shape (num_intervals, 2) with the index of the first
+            and the last block of each interval, counted from the start of the series.
+        """
+        creak = np.asarray(series) >= self.threshold
+        offset = self.position
+        self.position += creak.size
+        if self.N_GAP <= 0:
+            return np.empty((0, 2), dtype=np.intp)
+        edges = np.diff(np.concatenate(([0], creak.view(np.int8), [0])))
+        segments = []
+        for start, end in zip(np.flatnonzero(edges == 1) + offset, np.flatnonzero(edges == -1) + offset):
+            if self._start is not None and start - self._end <= self.N_GAP:
+                # gaps of up to N_GAP blocks are bridged, a gap of 0 continues a run
+                self._end = end
                 continue
-            elif n_segment >= N_MIN:
-                res[idx0:idx0+n_segment] = 1
-            n_segment = 0
-            idx0 = 0
-
-    # return res
-    creak_intervals = []
-    x1 = 0
-    while x1 < len(res) - 1:
-        if res[x1] == 1:
-            for x2, t1 in enumerate(res[x1 + 1:]):
-                if t1 == 0:
-                    creak_intervals.append((dt[x1], dt[x1 + x2]))
-                    x1 += x2 + 1
-                    break
-        x1 += 1
+            self._close(segments)
+            self._start, self._end = start, end
+        if self._start is not None and self.position - self._end > self.N_GAP:
+            self._close(segments)
+        return np.array(segments, dtype=np.intp).reshape(-1, 2)
 
-    if tgt_intervals is True:
-        interval_text = get_config()["PRAAT"]["interval_text"]
-        return [tgt.core.Interval(start_time=iv[0], end_time=iv[1], text=interval_text) for iv in creak_intervals]
+    def flush(self) -> np.ndarray:
+        """Ends the series and returns the open interval, unless it lasts until the end."""
+        segments = []
+        if self._start is not None and self._end < self.position:
+            self._close(segments)
+        self._start = self._end = None
+        return np.array(segments, dtype=np.intp).reshape(-1, 2)
 
-    return creak_intervals
-    # print(creak_bin)
-    # print()
-    # print(res)
+    def _close(self, segments: list):
+        if self._start is not None and self._end - self._start >= self.N_MIN:
+            segments.append((self._start, self._end - 1))
+        self._start = self._end = None
 
-    # while i + N_MIN + N_GAP< len(creak_bin):
-    #     if creak_bin[i] == 0: i+=1; continue
 
-    #     else:
-    #         segment = creak_bin[i:i+N_MIN+1]
+def get_creak_interval_array(series: np.ndarray, dt: np.ndarray, threshold: Optional[float] = None,
+                             config: Optional[dict] = None) -> np.ndarray:
+    """Returns the creak intervals as array of shape (num_intervals, 2) of start and end times.
 
-    #         i += len(segment)
+    See `get_creak_segments`, `dt` holds the time of each block.
+    """
+    return np.asarray(dt)[get_creak_segments(series, threshold, config)].reshape(-1, 2)
 
-    #     pass
 
-    creak_pos = []
-    # for idx in range(0, len(series) - 1):
-    #     if series[idx] < threshold and series[idx + 1] >= threshold:
-    #         creak_pos.append(idx + 1)
-    #     if series[idx] >= threshold and series[idx + 1] < threshold:
-    #         creak_pos.append(idx)
-    # creak_intervals = list(
-    #     map(lambda x: (x[0], x[1]), zip(*[iter(dt[creak_pos])] * 2)))
+def get_creak_intervals(series: np.ndarray, dt: np.ndarray, threshold: Optional[float] = None,
+                        tgt_intervals=False, config: Optional[dict] = None):
+    """Returns the creak intervals as list of (start, end) tuples or `tgt` intervals.
 
-    # for i, interval in enumerate(creak_intervals):
-    #     if interval[0] == interval[1] or abs(interval[0]-interval[1]) < _config["min_creak_length"]:
-    #         creak_intervals.pop(i)
+    See `get_creak_segments`, `dt` holds the time of each block.
+    """
+    _config = get_config_snapshot() if config is None else config
+    segments = get_creak_segments(series, threshold, _config)
+    dt = np.asarray(dt)
+    creak_intervals = list(zip(dt[segments[:, 0]], dt[segments[:, 1]]))
 
-    # return creak_intervals
+    if tgt_intervals is True:
+        interval_text = _config["PRAAT"]["interval_text"]
+        return [tgt.core.Interval(start_time=iv[0], end_time=iv[1], text=interval_text) for iv in creak_intervals]
+
+    return creak_intervals
 
 
-def get_time_vector(series: np.ndarray, sr: int, t0: float = 0):
+def get_time_vector(series: np.ndarray, sr: int, t0: float = 0,
+                    config: Optional[dict] = None):
 
-    config_ = get_config()['USER']
+    if config is None:
+        config = get_config_snapshot()
+    config_ = config['USER']
     N = config_["block_size"]
     R = config_["hop_size"]
 
@@ -157,20 +208,3 @@ def intervals_to_csv(intervals: list[tgt.core.Interval],
 
 def get_root() -> Path:
     return Path(__file__).parent.parent
-
-
-class ThreadWithReturnValue(Thread):
-    def __init__(self, group=None, target=None, name=None,
-                 args=(), kwargs={}, Verbose=None):
-        Thread.__init__(self, group, target, name, args, kwargs)
-        self._return = None
-
-    def run(self):
-        if self._target is not None:
-            self._return = self._target(*self._args,
-                                        **self._kwargs)
-
-    def join(self, *args):
-        Thread.join(self, *args)
-        return self._return
-    
\ No newline at end of file
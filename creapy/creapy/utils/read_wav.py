@@ -1,31 +1,121 @@
 from __future__ import annotations
+import os
+from functools import lru_cache
+
 import numpy as np
-from soundfile import read
+from soundfile import SoundFile, read
+
+NORMALIZATIONS = ("global", "local")
+# samples read at once by the streamed peak pass
+_PEAK_BLOCKSIZE = 1 << 20
 
 
 def read_wav(path: str, normalize: bool = True, start: float = 0.0, end: float | int = -1, mono=True,
-             **kwargs) -> tuple[np.ndarray, int]:
+             normalization: str = "global", **kwargs) -> tuple[np.ndarray, int]:
     """reads a .wav file given in the path
 
+    Only the samples between `start` and `end` are decoded.
+
     Args:
         path (str): the path to the wav file
+        normalize (bool, optional): whether the data is divided by its peak
+        start (float, optional): starttime in seconds
+        end (float | int, optional): endtime in seconds, -1 reads until the end of the file
+        normalization (str, optional): the normalization reference, "global" for the peak of
+            the whole file (read in a streamed pass if only a part of the file is decoded),
+            "local" for the peak of the decoded part
 
     Returns:
         ndarray: the audio data of the sound file in a numpy array
-        int: the sample rate of the sound file 
+        int: the sample rate of the sound file
     """
-    data, sr = read(path, **kwargs)
-    if mono is True and data.ndim > 1:
-        # convert to mono
-        data = data.sum(axis=1) / data.shape[1]
-
-    max_ = max(abs(data))
-    if end == -1:
-        data = data[int(start*sr):]
-    else:
-        data = data[int(start*sr):int(end*sr)]
+    if normalization not in NORMALIZATIONS:
+        raise ValueError(
+            f"Unknown normalization \"{normalization}\", choose one of {NORMALIZATIONS}")
+    with SoundFile(path) as f:
+        sr = f.samplerate
+        # same sample range as slicing the whole signal
+        first, last, _ = slice(int(start*sr), None if end == -1 else int(end*sr)).indices(f.frames)
+        f.seek(first)
+        data = f.read(max(last - first, 0), **kwargs)
+        if mono is True:
+            data = _to_mono(data)
 
-    if normalize is True:
-        data /= max_
+        if normalize is True:
+            if normalization == "global" and (first > 0 or last < f.frames):
+                data /= (stream_peak(path, mono=mono) if isinstance(path, (str, os.PathLike))
+                         else _stream_peak(f, mono, 0, None, _PEAK_BLOCKSIZE))
+            elif data.size:
+                data /= np.max(np.abs(data))
 
     return data, sr
+
+
+def _to_mono(data: np.ndarray) -> np.ndarray:
+    if data.ndim > 1:
+        # the sum is the only allocation, the division happens in place
+        mono = data.sum(axis=1)
+        mono /= data.shape[1]
+        return mono
+    return data
+
+
+def read_frames(path: str, start: int, stop: int, mono=True, dtype: str = "float64") -> np.ndarray:
+    """reads the samples `start` to `stop` of a sound file without decoding the rest
+
+    Args:
+        path (str): the path to the sound file
+        start (int): the first sample
+        stop (int): the sample after the last one
+        dtype (str, optional): the dtype of the returned data
+
+    Returns:
+        ndarray: the (unnormalized) audio data
+    """
+    data, _ = read(path, start=start, stop=stop, dtype=dtype)
+    return _to_mono(data) if mono is True else data
+
+
+def _stream_peak(f: SoundFile, mono: bool, start: int, stop: int | None, blocksize: int) -> float:
+    peak = 0.0
+    f.seek(start)
+    remaining = f.frames - start if stop is None else max(stop - start, 0)
+    while remaining > 0:
+        data = f.read(min(blocksize, remaining))
+        if len(data) == 0:
+            break
+        remaining -= len(data)
+        if mono is True:
+            data = _to_mono(data)
+        peak = max(peak, float(np.max(np.abs(data))))
+    return peak
+
+
+@lru_cache(maxsize=64)
+def _cached_stream_peak(path: str, mtime_ns: int, size: int, mono: bool, start: int,
+                        stop: int | None, blocksize: int) -> float:
+    with SoundFile(path) as f:
+        return _stream_peak(f, mono, start, stop, blocksize)
+
+
+def stream_peak(path: str, mono=True, start: int = 0, stop: int | None = None,
+                blocksize: int = _PEAK_BLOCKSIZE) -> float:
+    """returns the maximum absolute amplitude of a sound file, reading it block by block
+
+    The peaks of files on disk are cached until the file changes.
+
+    Args:
+        path (str): the path to the sound file
+        start (int, optional): the first sample
+        stop (int, optional): the sample after the last one, defaults to the end of the file
+        blocksize (int, optional): the number of samples read at once
+
+    Returns:
+        float: the peak, equal to the global normalization reference of `read_wav`
+    """
+    if isinstance(path, (str, os.PathLike)):
+        stat = os.stat(path)
+        return _cached_stream_peak(os.fspath(path), stat.st_mtime_ns, stat.st_size, mono,
+                                   start, stop, blocksize)
+    with SoundFile(path) as f:
+        return _stream_peak(f, mono, start, stop, blocksize)
@@ -0,0 +1,23 @@
+import pytest
+
+import creapy
+
+
+@pytest.fixture
+def make_config():
+    """Returns a function that builds a configuration with the given user settings.
+
+    The configurations run serially, without streaming and without the feature
+    cache, unless `stream_chunk_seconds` or `cache_directory` are given.
+    `intervals` overrides the postprocessing of the creak intervals.
+    """
+    def make(settings=None, stream_chunk_seconds=None, cache_directory=None, intervals=None):
+        config = creapy.apply_settings(settings)
+        config["EXECUTION"]["executor"] = "serial"
+        config["EXECUTION"]["stream_chunk_seconds"] = stream_chunk_seconds
+        config["FEATURE_CACHE"]["enabled"] = cache_directory is not None
+        if cache_directory is not None:
+            config["FEATURE_CACHE"]["directory"] = str(cache_directory)
+        config["MODEL"]["POSTPROCESSING"]["INTERVALS"].update(intervals or {})
+        return config
+    return make
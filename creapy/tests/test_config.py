@@ -0,0 +1,21 @@
+import pytest
+
+import creapy
+
+
+def test_get_config_returns_a_copy():
+    config = creapy.get_config()
+    hop_size = config["USER"]["hop_size"]
+    config["USER"]["hop_size"] = 2 * hop_size
+    config["MODEL"]["FEATURES"]["for_classification"].append("bogus")
+
+    assert creapy.get_config()["USER"]["hop_size"] == hop_size
+    assert "bogus" not in creapy.get_config()["MODEL"]["FEATURES"]["for_classification"]
+    assert creapy.apply_settings(None)["USER"]["hop_size"] == hop_size
+
+
+def test_config_snapshot_is_read_only():
+    snapshot = creapy.get_config_snapshot()
+    with pytest.raises(TypeError):
+        snapshot["USER"]["hop_size"] = 1
+    assert creapy.get_config_snapshot() is snapshot
@@ -0,0 +1,60 @@
+import importlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import creapy
+
+AUDIO = Path(__file__).parents[1] / "audio" / "example.wav"
+
+
+def test_cache_hit_returns_same_features(make_config, tmp_path):
+    config = make_config(cache_directory=tmp_path)
+    cache = creapy.get_feature_cache(config)
+    X, y_pred, _ = creapy.process_file(AUDIO, config=make_config())
+
+    X_first, y_first, _ = creapy.process_file(AUDIO, config=config)
+    assert (cache.hits, cache.misses) == (0, 1)
+    X_hit, y_hit, _ = creapy.process_file(AUDIO, config=config)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    for X_cached, y_cached in ((X_first, y_first), (X_hit, y_hit)):
+        pd.testing.assert_frame_equal(X_cached, X)
+        np.testing.assert_array_equal(y_cached, y_pred)
+
+
+def test_classification_settings_hit_and_framing_settings_miss(make_config, tmp_path):
+    config = make_config(cache_directory=tmp_path)
+    cache = creapy.get_feature_cache(config)
+    creapy.process_file(AUDIO, config=config)
+
+    # thresholds and the gender model are applied to the cached features
+    creapy.process_file(AUDIO, settings={"creak_threshold": 0.5, "gender_model": "female"}, config=config)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    X, y_pred, _ = creapy.process_file(AUDIO, settings={"hop_size": 0.02}, config=config)
+    assert (cache.hits, cache.misses) == (1, 2)
+    X_ref, y_ref, _ = creapy.process_file(AUDIO, settings={"hop_size": 0.02}, config=make_config())
+    pd.testing.assert_frame_equal(X, X_ref)
+    np.testing.assert_array_equal(y_pred, y_ref)
+
+
+def test_cache_hit_neither_hashes_nor_decodes_the_file(make_config, tmp_path, monkeypatch):
+    config = make_config(cache_directory=tmp_path)
+    X, y_pred, _ = creapy.process_file(AUDIO, config=config)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the file was read")
+
+    # as in a new process, which has no hash or peak of the file in memory
+    classify = importlib.import_module("creapy.model.classify")
+    feature_cache = importlib.import_module("creapy.utils.feature_cache")
+    monkeypatch.setattr(feature_cache, "content_hash", fail)
+    monkeypatch.setattr(classify, "stream_peak", fail)
+    monkeypatch.setattr(classify, "read_wav", fail)
+    X_hit, y_hit, _ = creapy.process_file(AUDIO, config=config)
+
+    assert creapy.get_feature_cache(config).hits == 1
+    pd.testing.assert_frame_equal(X_hit, X)
+    np.testing.assert_array_equal(y_hit, y_pred)
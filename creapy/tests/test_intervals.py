@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+import creapy
+
+
+def _loop_creak_intervals(series, dt, config):
+    """The frame by frame implementation `get_creak_intervals` replaced."""
+    threshold = config['USER']["creak_threshold"]
+    t_hop = config['USER']["hop_size"]
+    T_MIN = config["MODEL"]["POSTPROCESSING"]["INTERVALS"]["min_creak_length"]
+    T_GAP = config["MODEL"]["POSTPROCESSING"]["INTERVALS"]["max_gap"]
+    N_MIN = round(T_MIN / t_hop) + 1
+    N_GAP = round(T_GAP / t_hop) - 1
+    creak_bin = np.where(series >= threshold, 1, 0).astype(int)
+    res = np.zeros(creak_bin.shape).astype(int)
+    n_segment = 0
+    n_gap = np.arange(1, N_GAP + 1)
+    creak_bin = np.append(creak_bin, np.zeros(N_GAP))
+    for idx, c in enumerate(creak_bin[:-N_GAP]):
+        if c == 0 and not n_segment:
+            continue
+        elif c == 1 and not n_segment:
+            idx0 = idx
+            n_segment += 1
+        elif c == 1 and n_segment:
+            n_segment += 1
+        elif c == 0 and n_segment:
+            if any(creak_bin[idx + n_gap]):
+                n_segment += 1
+                continue
+            elif n_segment >= N_MIN:
+                res[idx0:idx0 + n_segment] = 1
+            n_segment = 0
+            idx0 = 0
+
+    creak_intervals = []
+    x1 = 0
+    while x1 < len(res) - 1:
+        if res[x1] == 1:
+            for x2, t1 in enumerate(res[x1 + 1:]):
+                if t1 == 0:
+                    creak_intervals.append((dt[x1], dt[x1 + x2]))
+                    x1 += x2 + 1
+                    break
+        x1 += 1
+    return creak_intervals
+
+
+def _random_series(rng, size):
+    """Creak probabilities with runs of creak and gaps of random lengths, and NaNs."""
+    lengths = rng.integers(1, 12, size=size)
+    creak = np.repeat(rng.random(size) < rng.uniform(0.2, 0.8), lengths)[:size]
+    series = np.where(creak, rng.uniform(0.75, 1.0, size), rng.uniform(0.0, 0.75, size))
+    series[rng.random(size) < 0.05] = np.nan
+    return series
+
+
+@pytest.mark.parametrize("hop_size, max_gap, min_creak_length", [
+    (0.01, 0.03, 0.05),
+    (0.01, 0.01, 0.0),
+    (0.01, 0.08, 0.12),
+    (0.005, 0.03, 0.05),
+    (0.02, 0.1, 0.04),
+])
+def test_creak_intervals_match_loop(make_config, hop_size, max_gap, min_creak_length):
+    config = make_config({"hop_size": hop_size},
+                         intervals={"max_gap": max_gap, "min_creak_length": min_creak_length})
+    rng = np.random.default_rng(14)
+    found = 0
+    for _ in range(300):
+        series = _random_series(rng, int(rng.integers(0, 200)))
+        dt = np.arange(series.size) * hop_size + 0.02
+        intervals = creapy.get_creak_intervals(series, dt, config=config)
+        assert intervals == _loop_creak_intervals(series, dt, config)
+        found += len(intervals)
+    # a max_gap below two hops never bridges, nor finds any interval
+    assert found > 0 or round(max_gap / hop_size) - 1 <= 0
+
+
+def test_creak_interval_array_and_tgt_intervals(make_config):
+    config = make_config(intervals={"max_gap": 0.03, "min_creak_length": 0.05})
+    series = np.array([0, 1, 1, 1, 1, 1, 1, 0, 0, 1, 1, 1, 0, 0, 0, 0, 0], dtype=float)
+    dt = np.arange(series.size) * 0.01
+
+    np.testing.assert_array_equal(creapy.get_creak_segments(series, config=config), [[1, 11]])
+    np.testing.assert_allclose(creapy.get_creak_interval_array(series, dt, config=config), [[0.01, 0.11]])
+    interval, = creapy.get_creak_intervals(series, dt, tgt_intervals=True, config=config)
+    assert (interval.start_time, interval.end_time) == (0.01, 0.11)
+    assert interval.text == config["PRAAT"]["interval_text"]
+
+
+@pytest.mark.parametrize("hop_size, max_gap, min_creak_length", [
+    (0.01, 0.03, 0.05),
+    (0.01, 0.01, 0.0),
+    (0.01, 0.08, 0.12),
+    (0.02, 0.1, 0.04),
+])
+def test_detector_matches_segments_over_random_batches(make_config, hop_size, max_gap,
+                                                       min_creak_length):
+    config = make_config({"hop_size": hop_size},
+                         intervals={"max_gap": max_gap, "min_creak_length": min_creak_length})
+    rng = np.random.default_rng(25)
+    for _ in range(200):
+        series = _random_series(rng, int(rng.integers(0, 200)))
+        splits = np.sort(rng.integers(0, series.size + 1, size=rng.integers(0, 8)))
+        detector = creapy.CreakIntervalDetector(config=config)
+        segments = [detector.push(batch) for batch in np.split(series, splits)]
+        segments.append(detector.flush())
+        np.testing.assert_array_equal(np.concatenate(segments),
+                                      creapy.get_creak_segments(series, config=config).reshape(-1, 2))
@@ -0,0 +1,33 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import creapy
+from creapy.model.classify import _use_streaming
+
+AUDIO = Path(__file__).parents[1] / "audio" / "example.wav"
+
+
+@pytest.mark.parametrize("chunk_seconds", [0.333, 0.5])
+def test_streamed_file_equals_in_memory(make_config, chunk_seconds):
+    # 0.333 s is not a multiple of the hop size
+    config = make_config(stream_chunk_seconds=chunk_seconds)
+    assert _use_streaming(AUDIO, config)
+    X, y_pred, sr = creapy.process_file(AUDIO, config=make_config())
+    X_stream, y_stream, sr_stream = creapy.process_file(AUDIO, config=config)
+
+    assert sr_stream == sr
+    pd.testing.assert_frame_equal(X_stream, X)
+    np.testing.assert_array_equal(y_stream, y_pred)
+
+
+def test_streamed_range_equals_in_memory(make_config):
+    settings = {"audio_start": 0.255, "audio_end": 2.1}
+    X, y_pred, _ = creapy.process_file(AUDIO, settings=settings, config=make_config())
+    X_stream, y_stream, _ = creapy.process_file(AUDIO, settings=settings,
+                                                config=make_config(stream_chunk_seconds=0.333))
+
+    pd.testing.assert_frame_equal(X_stream, X)
+    np.testing.assert_array_equal(y_stream, y_pred)
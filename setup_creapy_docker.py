@@ -29,6 +29,11 @@ for model_file in Path('/app/training_models').glob('*.csv'):
     shutil.copy2(model_file, models_dir / model_file.name)
     print(f"Copied model file: {model_file.name}")
 
+# Convert the models to pre-fitted artifacts so workers don't refit them on startup
+from creapy.model.artifact import convert_training_models
+for artifact_path in convert_training_models():
+    print(f"Wrote model artifact: {artifact_path.name}")
+
 # Create empty user config to avoid conflicts
 user_home_config = Path.home() / '.creapy' / 'config.yaml'
 user_home_config.parent.mkdir(exist_ok=True)
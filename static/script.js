@@ -17,6 +17,7 @@ const loadingSpinner = document.getElementById('loadingSpinner');
 const resultsSection = document.getElementById('results');
 const errorMessage = document.getElementById('errorMessage');
 const playPauseBtn = document.getElementById('playPauseBtn');
+const textgridBtn = document.getElementById('textgridBtn');
 const currentTimeDisplay = document.getElementById('currentTime');
 const totalTimeDisplay = document.getElementById('totalTime');
 
@@ -47,16 +48,63 @@ settingsPanel.addEventListener('click', (e) => {
     }
 });
 
-applySettingsBtn.addEventListener('click', () => {
+applySettingsBtn.addEventListener('click', async () => {
+    const previousSettings = { ...currentSettings };
     saveSettingsFromUI();
     settingsPanel.style.display = 'none';
     
     // If results are currently displayed, update the visualization with new settings
     if (audioData && resultsSection.style.display !== 'none') {
-        updateVisualizationWithNewSettings();
+        const changed = Object.keys(currentSettings).filter(
+            key => currentSettings[key] !== previousSettings[key]);
+        if (changed.some(key => key !== 'creak_threshold')) {
+            await reanalyze();
+        } else {
+            updateVisualizationWithNewSettings();
+        }
     }
 });
 
+// Classifies the analysed file again on the server, without uploading it again
+async function reanalyze() {
+    loadingSpinner.style.display = 'block';
+    errorMessage.style.display = 'none';
+    
+    try {
+        const response = await fetch('/reanalyze', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                analysis_id: audioData.analysis_id,
+                settings: currentSettings,
+                response_format: 'compact'
+            })
+        });
+        
+        if (response.status === 404 && fileInput.files.length) {
+            // the server dropped the analysis, start a new one
+            analyzeBtn.click();
+            return;
+        }
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        
+        const result = decodeCompact(await response.arrayBuffer());
+        audioData.creak_probability = result.creak_probability;
+        audioData.intervals = result.intervals;
+        plotCreakProbability();
+        updateVisualizationWithNewSettings();
+        
+    } catch (error) {
+        console.error('Error:', error);
+        errorMessage.textContent = 'Error analyzing audio: ' + error.message;
+        errorMessage.style.display = 'block';
+    } finally {
+        loadingSpinner.style.display = 'none';
+    }
+}
+
 resetSettingsBtn.addEventListener('click', () => {
     resetToDefaults();
     loadSettingsToUI();
@@ -118,6 +166,7 @@ analyzeBtn.addEventListener('click', async () => {
     
     const formData = new FormData();
     formData.append('file', file);
+    formData.append('response_format', 'compact');
     
     // Add settings to form data
     Object.keys(currentSettings).forEach(key => {
@@ -138,7 +187,9 @@ analyzeBtn.addEventListener('click', async () => {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
         
-        audioData = await response.json();
+        audioData = decodeCompact(await response.arrayBuffer());
+        // the compact response doesn't echo the audio, the browser still has the file
+        audioData.file = file;
         displayResults();
         
     } catch (error) {
@@ -153,8 +204,10 @@ analyzeBtn.addEventListener('click', async () => {
 function displayResults() {
     resultsSection.style.display = 'block';
     
-    // Create audio blob from base64
-    const audioBlob = base64ToBlob(audioData.audio_base64, 'audio/wav');
+    // Use the uploaded file, JSON responses also contain it as base64
+    const audioBlob = audioData.audio_base64
+        ? base64ToBlob(audioData.audio_base64, 'audio/wav')
+        : audioData.file;
     const audioUrl = URL.createObjectURL(audioBlob);
     
     // Initialize WaveSurfer
@@ -173,6 +226,14 @@ function initializeWaveSurfer(audioUrl) {
         wavesurfer.destroy();
     }
     
+    // The server's min/max overview is drawn instead of decoding the whole file in
+    // the browser, the audio is streamed by a media element for playback
+    const peaks = new Float32Array(2 * audioData.waveform.max.length);
+    audioData.waveform.max.forEach((value, i) => {
+        peaks[2 * i] = value;
+        peaks[2 * i + 1] = audioData.waveform.min[i];
+    });
+    
     // Create new WaveSurfer instance
     wavesurfer = window.WaveSurfer.create({
         container: '#waveform',
@@ -184,12 +245,12 @@ function initializeWaveSurfer(audioUrl) {
         responsive: true,
         height: 100,
         normalize: true,
-        backend: 'WebAudio',
+        backend: 'MediaElement',
         mediaControls: false
     });
     
     // Load audio
-    wavesurfer.load(audioUrl);
+    wavesurfer.load(audioUrl, [peaks], audioData.duration);
     
     // Set up event listeners
     wavesurfer.on('ready', () => {
@@ -327,6 +388,93 @@ playPauseBtn.addEventListener('click', () => {
     }
 });
 
+// Level of detail: the plot shows the server's min/max tiles of the visible range,
+// with about one bin per pixel, so long files stay accurate when zoomed in
+let tileRequest = 0;
+
+async function fetchTile(series, start, end, width) {
+    const params = new URLSearchParams({ series, start, end, width });
+    const response = await fetch(`/tiles/${audioData.analysis_id}?${params}`);
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    return response.json();
+}
+
+async function updateTiles(start = 0, end = -1) {
+    const request = ++tileRequest;
+    const width = Math.max(1, Math.round(document.getElementById('creakPlot').getBoundingClientRect().width));
+    try {
+        const [probability, waveform] = await Promise.all([
+            fetchTile('probability', start, end, width),
+            fetchTile('waveform', start, end, width)
+        ]);
+        // a later zoom or pan superseded this request
+        if (request !== tileRequest) return;
+        const times = tile => tile.max.map((_, i) => tile.t0 + i * tile.dt);
+        Plotly.restyle('creakPlot', {
+            x: [times(probability), times(waveform), times(waveform)],
+            y: [probability.max, waveform.max, waveform.min]
+        }, [0, 2, 3]);
+    } catch (error) {
+        console.error('Error loading tiles:', error);
+    }
+}
+
+// The TextGrid is only built by the server when it is downloaded
+textgridBtn.addEventListener('click', () => {
+    if (!audioData) return;
+    const params = new URLSearchParams({ creak_threshold: currentSettings.creak_threshold });
+    window.location.href = `/textgrid/${audioData.analysis_id}?${params}`;
+});
+
+// Decodes the compact binary response of /analyze and /reanalyze: a uint32 with the
+// length of a JSON header, the header and the arrays it describes
+function decodeCompact(buffer) {
+    const headerLength = new DataView(buffer).getUint32(0, true);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, headerLength)));
+    const base = 4 + headerLength;
+    const arrays = {};
+    Object.entries(header.arrays).forEach(([name, spec]) => {
+        const ArrayType = spec.dtype === '<u4' ? Uint32Array : Float32Array;
+        arrays[name] = new ArrayType(buffer, base + spec.offset, spec.length);
+    });
+    
+    const axis = (t0, dt, length) => Float64Array.from({ length }, (_, i) => t0 + i * dt);
+    
+    // alternating runs of zeros (gated blocks) and probabilities, starting with zeros
+    const cp = header.creak_probability;
+    const runs = arrays[cp.runs];
+    const values = arrays[cp.values];
+    const probability = new Float32Array(cp.length);
+    let position = 0;
+    let valueIndex = 0;
+    for (let i = 0; i < runs.length; i++) {
+        if (i % 2 === 1) {
+            probability.set(values.subarray(valueIndex, valueIndex + runs[i]), position);
+            valueIndex += runs[i];
+        }
+        position += runs[i];
+    }
+    
+    const result = {
+        ...header,
+        creak_probability: {
+            time: axis(cp.t0, cp.dt, cp.length),
+            probability: probability
+        }
+    };
+    if (header.waveform) {
+        result.waveform = {
+            ...header.waveform,
+            min: arrays[header.waveform.min],
+            max: arrays[header.waveform.max]
+        };
+    }
+    delete result.arrays;
+    return result;
+}
+
 function base64ToBlob(base64, mimeType) {
     const byteCharacters = atob(base64);
     const byteNumbers = new Array(byteCharacters.length);
@@ -352,14 +500,33 @@ function plotCreakProbability() {
     };
     
     const thresholdTrace = {
-        x: audioData.creak_probability.time,
-        y: new Array(audioData.creak_probability.time.length).fill(creakThreshold),
+        x: [0, audioData.duration],
+        y: [creakThreshold, creakThreshold],
         type: 'scatter',
         mode: 'lines',
         line: { color: '#95a5a6', width: 1, dash: 'dash' },
         name: `Threshold (${creakThreshold})`
     };
     
+    // min/max envelope of the waveform in the background, replaced by finer tiles on zoom
+    const waveformMaxTrace = {
+        x: [],
+        y: [],
+        yaxis: 'y2',
+        type: 'scatter',
+        mode: 'lines',
+        line: { color: 'rgba(52, 152, 219, 0.4)', width: 0.5 },
+        hoverinfo: 'skip',
+        showlegend: false
+    };
+    const waveformMinTrace = {
+        ...waveformMaxTrace,
+        fill: 'tonexty',
+        fillcolor: 'rgba(52, 152, 219, 0.15)',
+        name: 'Waveform',
+        showlegend: true
+    };
+    
     const layout = {
         title: 'Creaky Voice Probability Over Time',
         xaxis: { 
@@ -371,6 +538,14 @@ function plotCreakProbability() {
             range: [0, 1],
             showgrid: true
         },
+        yaxis2: {
+            overlaying: 'y',
+            side: 'right',
+            range: [-1, 1],
+            showgrid: false,
+            showticklabels: false,
+            fixedrange: true
+        },
         height: 300,
         margin: { t: 50, r: 20, b: 50, l: 60 },
         shapes: [],
@@ -382,7 +557,19 @@ function plotCreakProbability() {
         displayModeBar: false
     };
     
-    Plotly.newPlot('creakPlot', [probabilityTrace, thresholdTrace], layout, config);
+    Plotly.newPlot('creakPlot', [probabilityTrace, thresholdTrace, waveformMaxTrace, waveformMinTrace], layout, config);
+    
+    // Zooming and panning load the tiles of the visible range
+    const plotElement = document.getElementById('creakPlot');
+    plotElement.removeAllListeners('plotly_relayout');
+    plotElement.on('plotly_relayout', (event) => {
+        if (event['xaxis.autorange']) {
+            updateTiles();
+        } else if (event['xaxis.range[0]'] !== undefined) {
+            updateTiles(event['xaxis.range[0]'], event['xaxis.range[1]']);
+        }
+    });
+    updateTiles();
     
     // Add click handler to seek audio
     document.getElementById('creakPlot').addEventListener('click', (event) => {
@@ -411,11 +598,7 @@ function updateVisualizationWithNewSettings() {
     // Update the plot with new threshold line
     const creakThreshold = currentSettings.creak_threshold;
     const thresholdTrace = {
-        x: audioData.creak_probability.time,
-        y: new Array(audioData.creak_probability.time.length).fill(creakThreshold),
-        type: 'scatter',
-        mode: 'lines',
-        line: { color: '#95a5a6', width: 1, dash: 'dash' },
+        y: [creakThreshold, creakThreshold],
         name: `Threshold (${creakThreshold})`
     };
     
@@ -0,0 +1,113 @@
+"""Replays a WAV file in real time to the /stream endpoint and reports the latency.
+
+    python stream_client.py creapy/audio/example.wav --url ws://localhost:8000/stream
+
+The round trip of every chunk is measured from sending it to receiving its update.
+With creapy installed, the streamed result is compared with `creapy.process_array`
+of the whole file. Use `--streams` to replay the file on several streams at once.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+import soundfile as sf
+import websockets
+
+
+async def replay(url: str, data: np.ndarray, sr: int, chunk_ms: float, realtime: bool,
+                 peak=None, settings=None) -> dict:
+    chunk = max(1, int(sr * chunk_ms / 1000))
+    sent = {}
+    probability = []
+    intervals = []
+    round_trips = []
+    async with websockets.connect(url, max_size=None) as websocket:
+        await websocket.send(json.dumps({"sample_rate": sr, "format": "f32le", "channels": 1,
+                                         "peak": peak, "settings": settings or {}}))
+        ready = json.loads(await websocket.recv())
+        if ready["type"] != "ready":
+            raise RuntimeError(ready)
+
+        async def send():
+            start = time.perf_counter()
+            for i, offset in enumerate(range(0, len(data), chunk)):
+                if realtime:
+                    # the chunk is sent once it was "recorded"
+                    await asyncio.sleep(max(0.0, start + (offset + chunk) / sr - time.perf_counter()))
+                sent[i] = time.perf_counter()
+                await websocket.send(data[offset:offset + chunk].astype("<f4").tobytes())
+            sent[len(sent)] = time.perf_counter()
+            await websocket.send(json.dumps({"type": "end"}))
+
+        sender = asyncio.create_task(send())
+        async for message in websocket:
+            message = json.loads(message)
+            if message["type"] == "update":
+                round_trips.append(time.perf_counter() - sent[message["chunk"]])
+                probability.extend(message["probability"])
+                intervals.extend(message["intervals"])
+            elif message["type"] == "summary":
+                summary = message
+            else:
+                raise RuntimeError(message)
+        await sender
+    round_trips = np.array(round_trips) * 1000
+    return {
+        "probability": np.array(probability),
+        "intervals": np.array(intervals).reshape(-1, 2),
+        "round_trip_ms": {"p50": np.percentile(round_trips, 50), "p95": np.percentile(round_trips, 95),
+                          "max": round_trips.max()},
+        "server_latency_ms": summary["latency"]
+    }
+
+
+def compare(result: dict, data: np.ndarray, sr: int, settings=None):
+    try:
+        import creapy
+    except ImportError:
+        print("creapy is not installed, the result is not compared")
+        return
+    reference = creapy.process_array(data, sr, settings=settings)
+    config = creapy.apply_settings(settings)
+    intervals = creapy.get_creak_interval_array(reference.y_pred, reference.time, config=config)
+    probability = result["probability"]
+    same_blocks = len(probability) == len(reference.y_pred)
+    print(f"blocks: {len(probability)} streamed, {len(reference.y_pred)} in the whole file")
+    if same_blocks:
+        print(f"probability: {np.mean(np.isclose(probability, reference.y_pred, atol=1e-6)):.1%} of the blocks equal, "
+              f"max. difference {np.abs(probability - reference.y_pred).max():.3f}")
+    same_intervals = (result["intervals"].shape == intervals.shape
+                      and np.allclose(result["intervals"], intervals))
+    print(f"intervals: {len(result['intervals'])} streamed, {len(intervals)} in the whole file, "
+          f"{'equal' if same_intervals else 'different'}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("wav", nargs="?", default="creapy/audio/example.wav")
+    parser.add_argument("--url", default="ws://localhost:8000/stream")
+    parser.add_argument("--chunk-ms", type=float, default=20, help="length of the chunks in milliseconds")
+    parser.add_argument("--streams", type=int, default=1, help="number of concurrent streams")
+    parser.add_argument("--fast", action="store_true", help="send as fast as possible instead of in real time")
+    parser.add_argument("--peak", action="store_true",
+                        help="send the peak of the file, so that the signal is normalized like process_file")
+    args = parser.parse_args()
+
+    data, sr = sf.read(args.wav, dtype="float32", always_2d=True)
+    data = data.mean(axis=1)
+    peak = float(np.max(np.abs(data))) if args.peak else None
+    t = time.perf_counter()
+    results = await asyncio.gather(*(replay(args.url, data, sr, args.chunk_ms, not args.fast, peak)
+                                     for _ in range(args.streams)))
+    print(f"{args.streams} stream(s) of {len(data) / sr:.2f} s in {time.perf_counter() - t:.2f} s")
+    round_trips = np.array([[r["round_trip_ms"][k] for k in ("p50", "p95", "max")] for r in results])
+    print("round trip ms (worst stream): p50 {:.1f}, p95 {:.1f}, max {:.1f}".format(*round_trips.max(axis=0)))
+    print("server latency ms (first stream): p50 {p50_ms:.1f}, p95 {p95_ms:.1f}, max {max_ms:.1f}".format(
+        **results[0]["server_latency_ms"]))
+    compare(results[0], data, sr)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
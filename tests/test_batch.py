@@ -0,0 +1,51 @@
+import json
+from pathlib import Path
+
+import anyio
+import httpx
+import pytest
+
+import app
+
+AUDIO = Path("creapy/audio/example.wav")
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = app.AnalysisPool(workers=1, queue_depth=4)
+    monkeypatch.setattr(app, "pool", pool)
+    yield pool
+    pool.shutdown()
+
+
+def test_batch_lines_are_sent_when_ready(pool):
+    files = [("files", (f"{i}.wav", AUDIO.read_bytes(), "audio/wav")) for i in range(3)]
+    request = httpx.Request("POST", "http://test/analyze/batch", files=files,
+                            headers={"Accept-Encoding": "gzip"})
+    body = request.read()
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+             "scheme": "http", "path": "/analyze/batch", "raw_path": b"/analyze/batch",
+             "root_path": "", "query_string": b"", "server": ("test", 80), "client": ("test", 1),
+             "headers": [(key.lower(), value) for key, value in request.headers.raw]}
+    requests = [{"type": "http.request", "body": body, "more_body": False}]
+    messages = []
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        # the client stays connected
+        await anyio.sleep_forever()
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            # the first file is complete before the others are analysed
+            messages.append((message["body"], pool.completed))
+        elif message["type"] == "http.response.start":
+            assert b"content-encoding" not in dict(message["headers"])
+
+    anyio.run(app.app, scope, receive, send)
+    first, completed = messages[0]
+    assert completed < 3
+    record = json.loads(first.decode().splitlines()[0])
+    assert record["index"] in (0, 1, 2)
+    assert sum(body.count(b"\n") for body, _ in messages) >= 3
@@ -0,0 +1,88 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import app
+import creapy
+
+AUDIO = Path("creapy/audio/example.wav")
+
+
+@pytest.fixture
+def store(tmp_path):
+    return app.JobStore(tmp_path, lease=60)
+
+
+@pytest.fixture
+def workers(store):
+    pool = app.AnalysisPool(workers=1, queue_depth=0)
+    yield app.JobWorkers(lambda: store, pool)
+    pool.shutdown()
+
+
+def _submit(store) -> str:
+    return store.submit(AUDIO.read_bytes(), AUDIO.name, {"gender_model": "all"})
+
+
+def test_job_resumes_after_restart(tmp_path, store, workers):
+    job_id = _submit(store)
+    # a worker claims the job and stops without reporting progress again
+    assert store.claim()["id"] == job_id
+    store._execute("UPDATE jobs SET heartbeat = heartbeat - 120, frames_done = 100 WHERE id = ?", job_id)
+
+    # after a restart, the job is claimed again from the database
+    restarted = app.JobStore(tmp_path, lease=60)
+    job = restarted.claim()
+    assert (job["id"], job["attempts"], job["frames_done"]) == (job_id, 2, 0)
+    workers._store_factory = lambda: restarted
+    workers.run(job)
+
+    done = restarted.get(job_id)
+    assert done["status"] == "done"
+    assert done["frames_done"] == done["frames_total"]
+    assert not restarted.audio_path(job_id).exists()
+    with np.load(restarted.result_path(job_id)) as arrays:
+        probability = arrays["probability"]
+    _, y_pred, _ = creapy.process_file(AUDIO)
+    np.testing.assert_array_equal(probability, y_pred)
+
+
+def test_queued_job_can_be_cancelled(store):
+    job_id = _submit(store)
+    assert store.cancel(job_id)
+    assert store.get(job_id)["status"] == "cancelled"
+    assert not store.audio_path(job_id).exists()
+    assert store.claim() is None
+
+
+def test_running_job_stops_when_cancelled(store, workers):
+    job_id = _submit(store)
+    job = store.claim()
+    assert store.cancel(job_id)
+    # the worker still owns the audio of a running job
+    assert store.audio_path(job_id).exists()
+
+    workers.run(job)
+    assert store.get(job_id)["status"] == "cancelled"
+    assert not store.audio_path(job_id).exists()
+    assert not store.result_path(job_id).exists()
+
+
+@pytest.mark.parametrize("settings", [{"hop_size": "0"}, {"gender_model": "bogus"},
+                                      {"audio_start": "2", "audio_end": "1"}])
+def test_invalid_settings_are_rejected_on_submit(store, monkeypatch, settings):
+    monkeypatch.setattr(app, "get_job_store", lambda: store)
+    response = TestClient(app.app).post("/jobs", data=settings,
+                                        files={"file": (AUDIO.name, AUDIO.read_bytes(), "audio/wav")})
+    assert response.status_code == 422
+    assert store.claim() is None
+
+
+def test_expire_removes_finished_jobs(tmp_path):
+    store = app.JobStore(tmp_path, ttl=0)
+    job_id = _submit(store)
+    store.cancel(job_id)
+    store.expire()
+    assert store.get(job_id) is None
@@ -0,0 +1,36 @@
+import pytest
+
+import app
+import creapy
+
+AUDIO = "creapy/audio/example.wav"
+
+
+@pytest.fixture
+def session():
+    signal, sr = creapy.read_wav(AUDIO, normalize=False)
+    return app.AnalysisSession(signal, sr)
+
+
+def test_failed_evaluation_keeps_session(session):
+    result = session.evaluate({})
+    with pytest.raises(ValueError):
+        session.evaluate({"gender_model": "bogus"})
+    assert "gender_model" not in session.settings
+
+    again = session.evaluate({"zcr_threshold": 0.1})
+    assert len(again["creak_probability"]["probability"]) == len(result["creak_probability"]["probability"])
+
+
+@pytest.mark.parametrize("settings", [
+    {"hop_size": 0},
+    {"block_size": -0.04},
+    {"audio_start": 2, "audio_end": 1},
+    {"zcr_threshold": "high"},
+])
+def test_invalid_settings_are_rejected(session, settings):
+    session.evaluate({})
+    analysis = session.analysis
+    with pytest.raises(ValueError):
+        session.evaluate(settings)
+    assert session.analysis is analysis
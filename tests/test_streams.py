@@ -0,0 +1,43 @@
+import os
+import signal
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+import app
+
+CHUNK = np.zeros(8000, np.float32).tobytes()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app, "streams", app.StreamRegistry(workers=1, max_streams=1))
+    with TestClient(app.app) as client:
+        yield client
+
+
+def test_crashed_worker_frees_its_stream(client):
+    with client.websocket_connect("/stream") as ws:
+        ws.send_json({"sample_rate": 16000})
+        assert ws.receive_json()["type"] == "ready"
+        for pid in list(app.streams._executors[0]._processes):
+            os.kill(pid, signal.SIGKILL)
+        ws.send_bytes(CHUNK)
+        assert ws.receive_json()["type"] == "error"
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+        assert closed.value.code == 1011
+
+    # the slot is released and the next stream starts a new process
+    streams = client.get("/metrics").json()["streams"]
+    assert (streams["active"], streams["started"]) == (0, 0)
+    with client.websocket_connect("/stream") as ws:
+        ws.send_json({"sample_rate": 16000})
+        assert ws.receive_json()["type"] == "ready"
+        ws.send_bytes(CHUNK)
+        assert ws.receive_json()["type"] == "update"
+        ws.send_json({"type": "end"})
+        assert ws.receive_json()["type"] == "update"
+        assert ws.receive_json()["type"] == "summary"